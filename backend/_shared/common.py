@@ -0,0 +1,501 @@
+'''Общий слой backend-функций: пул соединений, метрики, пагинация, ETag, JSON-ответы и маршрутизация.
+
+Исходник — backend/_shared/common.py. В каждую функцию он копируется как common.py
+скриптом backend/_shared/sync.py, потому что функции развёртываются по отдельности.
+'''
+
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_PING_AFTER = float(os.environ.get('DB_POOL_PING_AFTER', '30'))
+
+_pool = None
+_last_used = {}
+_local = threading.local()
+
+
+def get_borrowed() -> list:
+    '''Соединения, выданные текущему потоку и ещё не возвращённые в пул'''
+    borrowed = getattr(_local, 'borrowed', None)
+    if borrowed is None:
+        borrowed = _local.borrowed = []
+    return borrowed
+
+
+class PooledConnection:
+    '''Соединение из пула: close() возвращает его в пул, а не разрывает'''
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        borrowed = get_borrowed()
+        if self in borrowed:
+            borrowed.remove(self)
+        release_db_connection(conn)
+
+
+def get_db_pool() -> ThreadedConnectionPool:
+    '''Пул соединений, живущий между тёплыми вызовами функции'''
+    global _pool
+    if _pool is None or _pool.closed:
+        dsn = os.environ.get('DATABASE_URL')
+        if not dsn:
+            raise Exception('DATABASE_URL not configured')
+        factory = {'connection_factory': InstrumentedConnection} if REQUEST_METRICS else {}
+        _pool = ThreadedConnectionPool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, dsn, **factory)
+        _last_used.clear()
+    return _pool
+
+
+def is_connection_healthy(conn) -> bool:
+    '''Проверка соединения: долго простаивавшие пингуются через SELECT 1'''
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None or time.monotonic() - last_used < DB_POOL_PING_AFTER:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute('SELECT 1')
+        cur.close()
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def get_db_connection() -> PooledConnection:
+    '''Подключение к базе данных из пула с переподключением битых соединений'''
+    started = time.perf_counter()
+    pool = get_db_pool()
+    for _ in range(DB_POOL_MAX_SIZE + 1):
+        conn = pool.getconn()
+        if is_connection_healthy(conn):
+            pooled = PooledConnection(conn)
+            get_borrowed().append(pooled)
+            record_metric('connect', time.perf_counter() - started)
+            return pooled
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    raise Exception('Database is unavailable')
+
+
+def release_db_connection(conn) -> None:
+    '''Возврат соединения в пул; незакрытая транзакция откатывается'''
+    broken = bool(conn.closed)
+    if not broken and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+    if broken:
+        _last_used.pop(id(conn), None)
+    else:
+        _last_used[id(conn)] = time.monotonic()
+    get_db_pool().putconn(conn, close=broken)
+
+
+def release_db_connections() -> None:
+    '''Возврат в пул соединений, не закрытых из-за исключения'''
+    for pooled in list(get_borrowed()):
+        pooled.close()
+
+
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS') == '1'
+SERVER_TIMING = os.environ.get('SERVER_TIMING') == '1'
+
+_request = threading.local()
+_instrumented_cursors = {}
+
+
+def record_metric(name: str, elapsed: float, **counters) -> None:
+    '''Добавить время и счётчики к метрикам текущего запроса (если сбор включён)'''
+    metrics = getattr(_request, 'metrics', None)
+    if metrics is None:
+        return
+    metrics[name + '_ms'] += elapsed * 1000
+    for key, value in counters.items():
+        metrics[key] += value
+
+
+def instrumented_cursor(factory):
+    '''Подкласс курсора, учитывающий число запросов, строки и время в БД'''
+    if factory not in _instrumented_cursors:
+        class InstrumentedCursor(factory):
+            def execute(self, query, vars=None):
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    rows = self.rowcount if self.description is not None and self.rowcount > 0 else 0
+                    record_metric('db', time.perf_counter() - started, queries=1, rows=rows)
+
+            def executemany(self, query, vars_list):
+                started = time.perf_counter()
+                try:
+                    return super().executemany(query, vars_list)
+                finally:
+                    record_metric('db', time.perf_counter() - started, queries=1)
+
+            def copy_expert(self, sql, file, size=8192):
+                started = time.perf_counter()
+                try:
+                    return super().copy_expert(sql, file, size)
+                finally:
+                    record_metric('db', time.perf_counter() - started, queries=1)
+
+        _instrumented_cursors[factory] = InstrumentedCursor
+    return _instrumented_cursors[factory]
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    '''Соединение, курсоры которого пишут метрики запроса (REQUEST_METRICS=1)'''
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=instrumented_cursor(factory), **kwargs)
+
+
+def start_request_metrics(action: str) -> dict:
+    '''Начать сбор метрик запроса'''
+    _request.metrics = {
+        'action': action, 'queries': 0, 'rows': 0,
+        'db_ms': 0.0, 'connect_ms': 0.0, 'serialize_ms': 0.0,
+        'started': time.perf_counter()
+    }
+    return _request.metrics
+
+
+def finish_request_metrics(metrics: dict, response: dict) -> None:
+    '''Записать метрики запроса структурированной строкой лога и в Server-Timing (SERVER_TIMING=1)'''
+    _request.metrics = None
+    metrics['total_ms'] = (time.perf_counter() - metrics.pop('started')) * 1000
+    metrics['status'] = response['statusCode']
+    for key in ('db_ms', 'connect_ms', 'serialize_ms', 'total_ms'):
+        metrics[key] = round(metrics[key], 2)
+    print(dumps({'type': 'request_metrics', **metrics}), flush=True)
+    if SERVER_TIMING:
+        response['headers'] = {
+            **response.get('headers', {}),
+            'Server-Timing': 'db;dur=%s;desc="%d queries, %d rows", connect;dur=%s, serialize;dur=%s, total;dur=%s' % (
+                metrics['db_ms'], metrics['queries'], metrics['rows'],
+                metrics['connect_ms'], metrics['serialize_ms'], metrics['total_ms']
+            ),
+            'Timing-Allow-Origin': '*'
+        }
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: list) -> str:
+    '''Курсор keyset-пагинации из ключей сортировки последней строки'''
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def get_page_params(params: dict, key_count: int, default_limit=None) -> tuple:
+    '''Размер страницы и ключи курсора; (None, None) — без пагинации'''
+    limit = params.get('limit') or default_limit
+    cursor = params.get('cursor')
+    if not limit and not cursor:
+        return None, None
+    limit = min(max(int(limit or DEFAULT_PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    if not cursor:
+        return limit, None
+    after = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(after, list) or len(after) != key_count:
+        raise ValueError('Invalid cursor')
+    return limit, after
+
+
+def split_page(rows: list, limit, keys: tuple) -> tuple:
+    '''Отрезать лишнюю строку страницы и вычислить nextCursor'''
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][key] for key in keys])
+
+
+def get_header(event: dict, name: str):
+    '''Заголовок запроса без учёта регистра'''
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+
+CHANGES_CHANNEL = 'chefassist_changes'
+
+
+def bump_versions(cur, restaurant_id, *resources, change: dict = None) -> None:
+    '''Увеличение версий ресурсов ресторана после записи; после коммита подписчики получают их через NOTIFY'''
+    cur.execute("""
+        WITH bumped AS (
+            INSERT INTO t_p93487342_chefassist_kitchen_m.resource_versions (restaurant_id, resource, version)
+            SELECT %(restaurant_id)s, unnest(%(resources)s::varchar[]), 1
+            ON CONFLICT (restaurant_id, resource) DO UPDATE SET version = resource_versions.version + 1
+            RETURNING resource, version
+        )
+        SELECT pg_notify(%(channel)s, json_build_object(
+            'restaurantId', %(restaurant_id)s::int,
+            'versions', json_object_agg(resource, version),
+            'change', %(change)s::json
+        )::text)
+        FROM bumped
+    """, {
+        'restaurant_id': restaurant_id,
+        'resources': list(resources),
+        'channel': CHANGES_CHANNEL,
+        'change': dumps(change) if change else None,
+    })
+
+
+def get_resource_version(conn, restaurant_id, resource: str) -> int:
+    '''Текущая версия ресурса ресторана'''
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT version FROM t_p93487342_chefassist_kitchen_m.resource_versions WHERE restaurant_id = %s AND resource = %s",
+        (restaurant_id, resource)
+    )
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else 0
+
+
+def make_etag(resource: str, version: int, params: dict) -> str:
+    '''ETag из версии ресурса и параметров запроса'''
+    digest = zlib.crc32(json.dumps(params, sort_keys=True, default=str).encode())
+    return f'"{resource}-{version}-{digest:08x}"'
+
+
+def get_etag(conn, params: dict, resource: str) -> str:
+    '''ETag из версии ресурса ресторана и параметров запроса'''
+    return make_etag(resource, get_resource_version(conn, params.get('restaurantId'), resource), params)
+
+
+def is_not_modified(event: dict, etag: str) -> bool:
+    '''Совпадает ли ETag с If-None-Match клиента'''
+    header = get_header(event, 'If-None-Match') or ''
+    return etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def etag_headers(etag: str) -> dict:
+    '''Заголовки условного GET для ответа'''
+    return {'ETag': etag, 'Cache-Control': 'no-cache', 'Access-Control-Expose-Headers': 'ETag'}
+
+
+def not_modified_response(etag: str) -> dict:
+    '''Ответ 304 без тела'''
+    return {
+        'statusCode': 304,
+        'headers': {'Access-Control-Allow-Origin': '*', **etag_headers(etag)},
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+
+def json_default(obj):
+    '''Сериализация Decimal, date, datetime и прочих типов из БД'''
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(payload) -> str:
+    '''JSON-кодирование через orjson, если он установлен'''
+    if orjson is not None:
+        return orjson.dumps(payload, default=json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(payload, default=json_default)
+
+
+def json_response(status: int, payload, headers: dict = None) -> dict:
+    '''Ответ функции с JSON-телом'''
+    started = time.perf_counter()
+    body = dumps(payload)
+    record_metric('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **(headers or {})},
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def json_rows(rows: list) -> str:
+    '''JSON-массив из строк, уже сериализованных Postgres (первая колонка — row_to_json::text)'''
+    return '[' + ','.join(row[0] for row in rows) + ']'
+
+
+def raw_json_response(status: int, fragments: dict, headers: dict = None) -> dict:
+    '''Ответ, собранный из готовых JSON-фрагментов без промежуточных dict'''
+    started = time.perf_counter()
+    body = '{' + ','.join('%s:%s' % (dumps(key), value) for key, value in fragments.items()) + '}'
+    record_metric('serialize', time.perf_counter() - started)
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **(headers or {})},
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def get_body(event: dict) -> dict:
+    '''Тело POST-запроса'''
+    return json.loads(event.get('body') or '{}')
+
+
+def dispatch(event: dict, routes: dict) -> dict:
+    '''Маршрутизация по (метод, action): CORS, метрики, 500 при исключении и возврат соединений в пул'''
+    method = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': ', '.join(sorted({route[0] for route in routes}) + ['OPTIONS']),
+                'Access-Control-Allow-Headers': 'Content-Type, If-None-Match'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    action = (event.get('queryStringParameters') or {}).get('action', '')
+    route = routes.get((method, action))
+    
+    if not route:
+        return json_response(400, {'error': 'Invalid action'})
+    
+    metrics = start_request_metrics(action) if REQUEST_METRICS else None
+    try:
+        response = route(event)
+    except Exception as e:
+        response = json_response(500, {'error': str(e)})
+    finally:
+        release_db_connections()
+    
+    if metrics is not None:
+        finish_request_metrics(metrics, response)
+    return response
+
+
+MAX_IMPORT_ROWS = 10000
+
+
+def read_import_rows(body: dict, required: tuple) -> list:
+    '''Строки импорта из CSV-текста (csv) или массива объектов (items); ValueError при неверном формате'''
+    if isinstance(body.get('csv'), str):
+        reader = csv.DictReader(io.StringIO(body['csv'].lstrip('\ufeff')))
+        missing = [column for column in required if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError('Missing CSV columns: ' + ', '.join(missing))
+        rows = list(reader)
+    elif isinstance(body.get('items'), list):
+        rows = body['items']
+    else:
+        raise ValueError('Expected csv or items')
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise ValueError('Too many rows, limit is %d' % MAX_IMPORT_ROWS)
+    return rows
+
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_value(value) -> str:
+    '''Поле в текстовом формате COPY: NULL только для None, пустая строка остаётся пустой строкой'''
+    if value is None:
+        return '\\N'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_rows(cur, table: str, columns: tuple, rows: list) -> None:
+    '''Загрузка строк во временную таблицу одним COPY'''
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert('COPY %s (%s) FROM STDIN' % (table, ', '.join(columns)), buffer)
+
+
+EXPORT_FETCH_SIZE = 2000
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def get_export_params(params: dict) -> tuple:
+    '''Формат выгрузки, сжатие и диапазон дат (from/to, включительно); ValueError при неверных значениях'''
+    export_format = params.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(export_format)
+    compress = params.get('gzip', '1') not in ('0', 'false')
+    date_from = date.fromisoformat(params['from']) if params.get('from') else None
+    date_to = date.fromisoformat(params['to']) if params.get('to') else None
+    return export_format, compress, date_from, date_to
+
+
+def iter_export_chunks(cur, columns: list, export_format: str):
+    '''Выгрузка кусками по EXPORT_FETCH_SIZE строк из серверного курсора'''
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield '\ufeff' + buffer.getvalue()
+    while True:
+        rows = cur.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            break
+        if export_format == 'csv':
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            yield buffer.getvalue()
+        else:
+            yield ''.join(dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def export_response(chunks, export_format: str, compress: bool, filename: str) -> dict:
+    '''Ответ-файл; с gzip в памяти держится только сжатый результат'''
+    headers = {'Access-Control-Allow-Origin': '*', 'Access-Control-Expose-Headers': 'Content-Disposition'}
+    filename += '.' + export_format
+    if compress:
+        output = io.BytesIO()
+        with gzip.GzipFile(fileobj=output, mode='wb', mtime=0, compresslevel=6) as archive:
+            for chunk in chunks:
+                archive.write(chunk.encode('utf-8'))
+        headers['Content-Type'] = 'application/gzip'
+        headers['Content-Disposition'] = 'attachment; filename="%s.gz"' % filename
+        return {'statusCode': 200, 'headers': headers, 'body': base64.b64encode(output.getvalue()).decode('ascii'), 'isBase64Encoded': True}
+    headers['Content-Type'] = EXPORT_FORMATS[export_format] + '; charset=utf-8'
+    headers['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return {'statusCode': 200, 'headers': headers, 'body': ''.join(chunks), 'isBase64Encoded': False}
@@ -0,0 +1,51 @@
+'''Копирование общего слоя backend/_shared/common.py в каждую функцию (backend/<name>/common.py).
+
+Функции развёртываются по отдельности, поэтому каждая получает свою копию модуля.
+Правки вносятся только в backend/_shared/common.py, после чего:
+
+    python backend/_shared/sync.py          # обновить копии
+    python backend/_shared/sync.py --check  # перед сборкой: код 1, если копия устарела
+'''
+
+import argparse
+import sys
+from pathlib import Path
+
+SHARED_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = SHARED_DIR.parent
+SOURCE = SHARED_DIR / 'common.py'
+HEADER = '# Не редактировать: копия backend/_shared/common.py, обновляется backend/_shared/sync.py\n'
+
+
+def get_functions() -> list:
+    '''Каталоги функций: backend/<name>/index.py'''
+    return sorted(path.parent for path in BACKEND_DIR.glob('*/index.py'))
+
+
+def vendored_source() -> str:
+    '''Содержимое копии common.py для функции'''
+    return HEADER + SOURCE.read_text(encoding='utf-8')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='только проверить, что копии совпадают с исходником')
+    args = parser.parse_args()
+
+    expected = vendored_source()
+    stale = []
+    for function_dir in get_functions():
+        target = function_dir / 'common.py'
+        if target.exists() and target.read_text(encoding='utf-8') == expected:
+            continue
+        stale.append(target)
+        if not args.check:
+            target.write_text(expected, encoding='utf-8')
+
+    for target in stale:
+        print(('stale: %s' if args.check else 'updated: %s') % target.relative_to(BACKEND_DIR.parent))
+    return 1 if args.check and stale else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,73 +1,173 @@
-import json
 import os
 import random
 import string
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
+import time
+from collections import OrderedDict
+from psycopg2.extras import RealDictCursor, execute_values
+
+from common import (
+    bump_versions, dispatch, etag_headers, get_body, get_db_connection, get_etag, get_page_params,
+    get_resource_version, is_not_modified, json_response, make_etag, not_modified_response,
+    split_page
+)
+
 
 def handler(event: dict, context) -> dict:
     '''API для регистрации и авторизации пользователей ресторанов'''
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    path = event.get('queryStringParameters', {}).get('action', '')
+    return dispatch(event, ROUTES)
+
+
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', '60'))
+AUTH_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', '4096'))
+
+
+class TTLCache:
+    '''Ограниченный кэш экземпляра функции: TTL и вытеснение давно не читавшихся записей'''
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+restaurants_by_code = TTLCache(AUTH_CACHE_TTL, AUTH_CACHE_MAX_ENTRIES)
+restaurants_by_id = TTLCache(AUTH_CACHE_TTL, AUTH_CACHE_MAX_ENTRIES)
+employees_by_name = TTLCache(AUTH_CACHE_TTL, AUTH_CACHE_MAX_ENTRIES)
+
+
+def load_restaurant_by_code(cur, invite_code: str):
+    '''Ресторан по коду приглашения из базы с сохранением в кэш'''
+    cur.execute("SELECT * FROM restaurants WHERE invite_code = %s", (invite_code,))
+    restaurant = cur.fetchone()
+    if not restaurant:
+        return None
+    restaurant = dict(restaurant)
+    restaurants_by_code.set(invite_code, restaurant)
+    return restaurant
+
+
+def find_employee_by_name(conn, cur, restaurant_id, name: str):
+    '''Сотрудник ресторана по имени: из кэша, если версия сотрудников ресторана не менялась, иначе из базы'''
+    key = (str(restaurant_id), name)
+    version = get_resource_version(conn, restaurant_id, 'employees')
+    cached = employees_by_name.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    cur.execute(
+        "SELECT * FROM employees WHERE restaurant_id = %s AND name = %s",
+        (restaurant_id, name)
+    )
+    employee = cur.fetchone()
+    if not employee:
+        employees_by_name.delete(key)
+        return None
+    employee = dict(employee)
+    employees_by_name.set(key, (version, employee))
+    return employee
+
+
+PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL', '90'))
+PRESENCE_FLUSH_INTERVAL = float(os.environ.get('PRESENCE_FLUSH_INTERVAL', '15'))
+PRESENCE_FLUSH_BATCH = int(os.environ.get('PRESENCE_FLUSH_BATCH', '200'))
+
+_presence = {}
+_presence_seen = {}
+_presence_flushed_at = time.monotonic()
+_presence_lock = threading.Lock()
+
+
+def record_heartbeat(employee_id: int, is_online: bool) -> bool:
+    '''Запомнить heartbeat в буфере; True — буфер пора записать в базу'''
+    now = time.monotonic()
+    with _presence_lock:
+        last_seen = _presence_seen.get(employee_id)
+        _presence[employee_id] = (is_online, now)
+        _presence_seen[employee_id] = now
+        return (
+            not is_online
+            or last_seen is None
+            or now - last_seen > PRESENCE_TTL
+            or len(_presence) >= PRESENCE_FLUSH_BATCH
+            or now - _presence_flushed_at >= PRESENCE_FLUSH_INTERVAL
+        )
+
+
+def requeue_presence(batch: list) -> None:
+    '''Вернуть в буфер heartbeat, которые не удалось записать; более свежий heartbeat из буфера не затирается'''
+    with _presence_lock:
+        for employee_id, (is_online, beat) in batch:
+            current = _presence.get(employee_id)
+            if current is None or current[1] < beat:
+                _presence[employee_id] = (is_online, beat)
+
+
+def flush_presence(conn) -> None:
+    '''Записать буфер heartbeat в базу; если запись не удалась, пачка возвращается в буфер'''
+    global _presence_flushed_at
+    now = time.monotonic()
+    with _presence_lock:
+        batch = sorted(_presence.items())
+        _presence.clear()
+        _presence_flushed_at = now
+        for employee_id in [k for k, seen in _presence_seen.items() if now - seen > PRESENCE_TTL]:
+            del _presence_seen[employee_id]
+    
+    if not batch:
+        return
     
     try:
-        if method == 'GET':
-            if path == 'get_restaurant':
-                return get_restaurant_info(event)
-        
-        elif method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            
-            if path == 'create_restaurant':
-                return create_restaurant(body)
-            elif path == 'join_restaurant':
-                return join_restaurant(body)
-            elif path == 'login_existing':
-                return login_existing_employee(body)
-            elif path == 'get_employees':
-                return get_employees(body)
-            elif path == 'update_employee_role':
-                return update_employee_role(body)
-            elif path == 'remove_employee':
-                return remove_employee(body)
-            elif path == 'update_online_status':
-                return update_online_status(body)
-        
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid action'}),
-            'isBase64Encoded': False
-        }
-    
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
-
-
-def get_db_connection():
-    '''Подключение к базе данных'''
-    db_url = os.environ.get('DATABASE_URL')
-    if not db_url:
-        raise Exception('DATABASE_URL not configured')
-    return psycopg2.connect(db_url)
+        write_presence(conn, batch, now)
+    except Exception:
+        requeue_presence(batch)
+        raise
+
+
+def write_presence(conn, batch: list, now: float) -> None:
+    '''UPDATE пачки heartbeat и NOTIFY по ресторанам в одной транзакции'''
+    cur = conn.cursor()
+    updated = execute_values(cur, """
+        UPDATE employees e
+        SET is_online = v.is_online, last_seen = CURRENT_TIMESTAMP - v.age * interval '1 second'
+        FROM (VALUES %s) AS v (id, is_online, age)
+        WHERE e.id = v.id
+        RETURNING e.restaurant_id, e.id, e.is_online
+    """, [(employee_id, is_online, now - beat) for employee_id, (is_online, beat) in batch],
+        template='(%s::int, %s::boolean, %s::float8)', fetch=True)
+    
+    changes = {}
+    for restaurant_id, employee_id, is_online in updated:
+        change = changes.setdefault(restaurant_id, {'action': 'update_online_status', 'online': [], 'offline': []})
+        change['online' if is_online else 'offline'].append(employee_id)
+    for restaurant_id in sorted(changes):
+        bump_versions(cur, restaurant_id, 'employees', change=changes[restaurant_id])
+    conn.commit()
+    cur.close()
 
 
 def generate_invite_code() -> str:
@@ -75,18 +175,14 @@ def generate_invite_code() -> str:
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
 
 
-def create_restaurant(body: dict) -> dict:
+def create_restaurant(event: dict) -> dict:
     '''Создание нового ресторана'''
+    body = get_body(event)
     chef_name = body.get('chefName')
     restaurant_name = body.get('restaurantName')
     
     if not chef_name or not restaurant_name:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -105,73 +201,48 @@ def create_restaurant(body: dict) -> dict:
     )
     employee = dict(cur.fetchone())
     
+    bump_versions(cur, restaurant['id'], 'restaurant', 'employees')
+    
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({
-            'restaurant': restaurant,
-            'employee': employee
-        }, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {
+        'restaurant': restaurant,
+        'employee': employee
+    })
 
 
-def join_restaurant(body: dict) -> dict:
+def join_restaurant(event: dict) -> dict:
     '''Присоединение сотрудника к ресторану'''
+    body = get_body(event)
     name = body.get('name')
     role = body.get('role')
     invite_code = body.get('inviteCode')
     
     if not name or not role or not invite_code:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute("SELECT * FROM restaurants WHERE invite_code = %s", (invite_code,))
-    restaurant = cur.fetchone()
+    restaurant = restaurants_by_code.get(invite_code) or load_restaurant_by_code(cur, invite_code)
     
     if not restaurant:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid invite code'}),
-            'isBase64Encoded': False
-        }
-    
-    restaurant = dict(restaurant)
+        return json_response(404, {'error': 'Invalid invite code'})
     
-    cur.execute(
-        "SELECT * FROM employees WHERE restaurant_id = %s AND name = %s",
-        (restaurant['id'], name)
-    )
-    existing_employee = cur.fetchone()
+    existing_employee = find_employee_by_name(conn, cur, restaurant['id'], name)
     
     if existing_employee:
-        employee = dict(existing_employee)
         cur.close()
         conn.close()
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'restaurant': restaurant,
-                'employee': employee,
-                'isExisting': True
-            }, default=str),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'restaurant': restaurant,
+            'employee': existing_employee,
+            'isExisting': True
+        })
     
     cur.execute(
         "INSERT INTO employees (name, role, restaurant_id) VALUES (%s, %s, %s) RETURNING id, name, role, restaurant_id, joined_at",
@@ -179,159 +250,145 @@ def join_restaurant(body: dict) -> dict:
     )
     employee = dict(cur.fetchone())
     
+    bump_versions(cur, restaurant['id'], 'employees')
+    
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({
-            'restaurant': restaurant,
-            'employee': employee,
-            'isExisting': False
-        }, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {
+        'restaurant': restaurant,
+        'employee': employee,
+        'isExisting': False
+    })
 
 
-def login_existing_employee(body: dict) -> dict:
+def login_existing_employee(event: dict) -> dict:
     '''Вход для существующего сотрудника'''
+    body = get_body(event)
     name = body.get('name')
     invite_code = body.get('inviteCode')
     
     if not name or not invite_code:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute("SELECT * FROM restaurants WHERE invite_code = %s", (invite_code,))
-    restaurant = cur.fetchone()
+    restaurant = restaurants_by_code.get(invite_code) or load_restaurant_by_code(cur, invite_code)
     
     if not restaurant:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid invite code'}),
-            'isBase64Encoded': False
-        }
+        return json_response(404, {'error': 'Invalid invite code'})
     
-    restaurant = dict(restaurant)
-    
-    cur.execute(
-        "SELECT * FROM employees WHERE restaurant_id = %s AND name = %s",
-        (restaurant['id'], name)
-    )
-    employee = cur.fetchone()
+    employee = find_employee_by_name(conn, cur, restaurant['id'], name)
     
     cur.close()
     conn.close()
     
     if not employee:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Employee not found in this restaurant'}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({
-            'restaurant': restaurant,
-            'employee': dict(employee)
-        }, default=str),
-        'isBase64Encoded': False
-    }
+        return json_response(404, {'error': 'Employee not found in this restaurant'})
+    
+    return json_response(200, {
+        'restaurant': restaurant,
+        'employee': employee
+    })
 
 
 def get_restaurant_info(event: dict) -> dict:
     '''Получение информации о ресторане'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
     if not restaurant_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing restaurantId'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing restaurantId'})
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cached = restaurants_by_id.get(str(restaurant_id))
     
-    cur.execute("SELECT * FROM restaurants WHERE id = %s", (restaurant_id,))
-    restaurant = cur.fetchone()
+    if cached is None:
+        conn = get_db_connection()
+        version = get_resource_version(conn, restaurant_id, 'restaurant')
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        
+        cur.execute("SELECT * FROM restaurants WHERE id = %s", (restaurant_id,))
+        restaurant = cur.fetchone()
+        
+        cur.close()
+        conn.close()
+        
+        if not restaurant:
+            return json_response(404, {'error': 'Restaurant not found'})
+        
+        cached = (version, dict(restaurant))
+        restaurants_by_id.set(str(restaurant_id), cached)
     
-    cur.close()
-    conn.close()
+    version, restaurant = cached
+    etag = make_etag('restaurant', version, params)
+    if is_not_modified(event, etag):
+        return not_modified_response(etag)
     
-    if not restaurant:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Restaurant not found'}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'restaurant': dict(restaurant)}, default=str),
-        'isBase64Encoded': False
-    }
-
-
-def get_employees(body: dict) -> dict:
-    '''Получение списка сотрудников ресторана'''
+    return json_response(200, {'restaurant': restaurant}, etag_headers(etag))
+
+
+def get_employees(event: dict) -> dict:
+    '''Получение списка сотрудников ресторана (постранично при заданных limit/cursor)'''
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     
     if not restaurant_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing restaurant_id'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing restaurant_id'})
+    
+    try:
+        limit, after = get_page_params(body, 2)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid pagination parameters'})
+    
+    query = """
+        SELECT id, name, role, restaurant_id, joined_at, email, password_hash, last_seen,
+               COALESCE(is_online AND last_seen > CURRENT_TIMESTAMP - %s * interval '1 second', false) AS is_online
+        FROM employees
+        WHERE restaurant_id = %s
+    """
+    args = [PRESENCE_TTL, restaurant_id]
+    if after:
+        query += " AND (joined_at, id) > (%s, %s)"
+        args += after
+    query += " ORDER BY joined_at, id"
+    if limit:
+        query += " LIMIT %s"
+        args.append(limit + 1)
     
     conn = get_db_connection()
+    
+    if _presence:
+        flush_presence(conn)
+    
+    presence_window = int(time.time() // PRESENCE_FLUSH_INTERVAL)
+    etag = get_etag(conn, {**body, 'presenceWindow': presence_window}, 'employees')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute("SELECT * FROM employees WHERE restaurant_id = %s ORDER BY joined_at", (restaurant_id,))
-    employees = [dict(row) for row in cur.fetchall()]
+    cur.execute(query, args)
+    employees, next_cursor = split_page([dict(row) for row in cur.fetchall()], limit, ('joined_at', 'id'))
     
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'employees': employees}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'employees': employees, 'nextCursor': next_cursor}, etag_headers(etag))
 
 
-def update_employee_role(body: dict) -> dict:
+def update_employee_role(event: dict) -> dict:
     '''Обновление роли сотрудника'''
+    body = get_body(event)
     employee_id = body.get('employeeId')
     new_role = body.get('newRole')
     
     if not employee_id or not new_role:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -345,94 +402,66 @@ def update_employee_role(body: dict) -> dict:
     if not employee:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Employee not found'}),
-            'isBase64Encoded': False
-        }
+        return json_response(404, {'error': 'Employee not found'})
     
     employee = dict(employee)
+    bump_versions(cur, employee['restaurant_id'], 'employees')
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'employee': employee}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'employee': employee})
 
 
-def remove_employee(body: dict) -> dict:
+def remove_employee(event: dict) -> dict:
     '''Удаление сотрудника'''
+    body = get_body(event)
     employee_id = body.get('employeeId')
     
     if not employee_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing employee_id'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing employee_id'})
     
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute("DELETE FROM employees WHERE id = %s", (employee_id,))
+    cur.execute("DELETE FROM employees WHERE id = %s RETURNING restaurant_id", (employee_id,))
+    employee = cur.fetchone()
+    if employee:
+        bump_versions(cur, employee[0], 'employees')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
 
 
-def update_online_status(body: dict) -> dict:
-    '''Обновление онлайн-статуса сотрудника'''
+def update_online_status(event: dict) -> dict:
+    '''Heartbeat онлайн-статуса сотрудника: копится в памяти и пишется в базу пачкой'''
+    body = get_body(event)
     employee_id = body.get('employeeId')
-    is_online = body.get('isOnline', True)
-    
-    if not employee_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing employee_id'}),
-            'isBase64Encoded': False
-        }
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    is_online = bool(body.get('isOnline', True))
     
-    cur.execute(
-        "UPDATE employees SET is_online = %s, last_seen = CURRENT_TIMESTAMP WHERE id = %s RETURNING id, is_online, last_seen",
-        (is_online, employee_id)
-    )
-    employee = cur.fetchone()
+    try:
+        employee_id = int(employee_id)
+    except (TypeError, ValueError):
+        return json_response(400, {'error': 'Missing employee_id'})
     
-    if not employee:
-        cur.close()
+    if record_heartbeat(employee_id, is_online):
+        conn = get_db_connection()
+        flush_presence(conn)
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Employee not found'}),
-            'isBase64Encoded': False
-        }
     
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'employee': dict(employee)}, default=str),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    return json_response(200, {'employee': {'id': employee_id, 'is_online': is_online}})
+
+
+ROUTES = {
+    ('GET', 'get_restaurant'): get_restaurant_info,
+    ('POST', 'create_restaurant'): create_restaurant,
+    ('POST', 'join_restaurant'): join_restaurant,
+    ('POST', 'login_existing'): login_existing_employee,
+    ('POST', 'get_employees'): get_employees,
+    ('POST', 'update_employee_role'): update_employee_role,
+    ('POST', 'remove_employee'): remove_employee,
+    ('POST', 'update_online_status'): update_online_status,
+}
@@ -1,106 +1,418 @@
 import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from decimal import Decimal
+from psycopg2.extras import RealDictCursor, execute_values
+
+from common import (
+    bump_versions, copy_rows, dispatch, etag_headers, get_body, get_db_connection, get_etag,
+    get_page_params, is_not_modified, json_response, not_modified_response, read_import_rows,
+    split_page
+)
+
 
 def handler(event: dict, context) -> dict:
     '''API для работы с ТТК, чек-листами и инвентарем ресторана'''
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+    return dispatch(event, ROUTES)
+
+
+INGREDIENT_SEPARATOR = re.compile(r'\s+[-–—]\s+')
+INGREDIENT_SLASH = re.compile(r'^(.*\S)\s+(\d+(?:[.,]\d+)?)\s*/\s*(\d+(?:[.,]\d+)?)\s*(.*)$')
+INGREDIENT_QUANTITY = re.compile(r'^(\d+(?:[.,]\d+)?)\s*(.*)$')
+
+
+def parse_quantity(text: str) -> tuple:
+    '''Число и единица из «350г», «0,5 кг»; (None, None), если числа нет'''
+    match = INGREDIENT_QUANTITY.match((text or '').strip())
+    if not match:
+        return None, None
+    value = Decimal(match.group(1).replace(',', '.'))
+    unit = match.group(2).strip(' .').lower()
+    return (value if value < 10 ** 9 else None), unit or None
+
+
+def parse_ingredients(text: str) -> list:
+    '''Разбор состава ТТК по строкам: «Наименование - Брутто - Нетто», «Наименование - Нетто» или «Наименование 100/80 г»'''
+    ingredients = []
+    for line in re.split(r'\r?\n|\r', text or ''):
+        line = line.strip()
+        if not line:
+            continue
+        parts = INGREDIENT_SEPARATOR.split(line)
+        slash = INGREDIENT_SLASH.match(line) if len(parts) == 1 else None
+        if slash:
+            name, gross, net = slash.group(1), slash.group(2) + slash.group(4), slash.group(3) + slash.group(4)
+        elif len(parts) >= 3:
+            name, gross, net = parts[0], parts[1], parts[2]
+        elif len(parts) == 2:
+            name, gross, net = parts[0], parts[1], parts[1]
+        else:
+            name, gross, net = line, None, None
+        gross, gross_unit = parse_quantity(gross)
+        net, net_unit = parse_quantity(net)
+        ingredients.append((name.strip()[:255], gross, net, (net_unit or gross_unit or '')[:50] or None))
+    return ingredients
+
+
+def sync_ttk_ingredients(cur, ttk_rows: list) -> None:
+    '''Пересобрать ttk_ingredients по тексту состава для [(ttk_id, restaurant_id, ingredients)]'''
+    cur.execute("DELETE FROM ttk_ingredients WHERE ttk_id = ANY(%s)", ([row[0] for row in ttk_rows],))
+    values = [
+        (ttk_id, restaurant_id, position, name, gross, net, unit)
+        for ttk_id, restaurant_id, ingredients in ttk_rows
+        for position, (name, gross, net, unit) in enumerate(parse_ingredients(ingredients), start=1)
+    ]
+    if not values:
+        return
+    execute_values(cur, """
+        INSERT INTO ttk_ingredients (ttk_id, restaurant_id, position, name, product_id, gross, net, unit)
+        SELECT v.ttk_id, v.restaurant_id, v.position, v.name,
+               (SELECT min(p.id) FROM products p WHERE p.restaurant_id = v.restaurant_id AND lower(p.name) = lower(v.name)),
+               v.gross, v.net, v.unit
+        FROM (VALUES %s) AS v (ttk_id, restaurant_id, position, name, gross, net, unit)
+    """, values, template='(%s::int, %s::int, %s::int, %s::varchar, %s::numeric, %s::numeric, %s::varchar)', page_size=1000)
+
+
+def get_ttk(event: dict) -> dict:
+    '''Получение списка ТТК ресторана (постранично при заданных limit/cursor)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
-    action = event.get('queryStringParameters', {}).get('action', '')
+    if not restaurant_id:
+        return json_response(400, {'error': 'Missing restaurantId'})
     
     try:
-        if method == 'GET':
-            if action == 'get_ttk':
-                return get_ttk(event)
-            elif action == 'get_checklists':
-                return get_checklists(event)
+        limit, after = get_page_params(params, 2)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid pagination parameters'})
+    
+    query = "SELECT * FROM ttk WHERE restaurant_id = %s"
+    args = [restaurant_id]
+    if after:
+        query += " AND (created_at, id) < (%s, %s)"
+        args += after
+    query += " ORDER BY created_at DESC, id DESC"
+    if limit:
+        query += " LIMIT %s"
+        args.append(limit + 1)
+    
+    conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'ttk')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    cur.execute(query, args)
+    ttk_list, next_cursor = split_page([dict(row) for row in cur.fetchall()], limit, ('created_at', 'id'))
+    
+    cur.close()
+    conn.close()
+    
+    return json_response(200, {'ttk': ttk_list, 'nextCursor': next_cursor}, etag_headers(etag))
+
+
+def get_ttk_by_product(event: dict) -> dict:
+    '''ТТК ресторана, в составе которых есть продукт (по ссылке или по совпадению названия)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    product_id = params.get('productId')
+    
+    if not restaurant_id or not product_id:
+        return json_response(400, {'error': 'Missing restaurantId or productId'})
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    cur.execute("""
+        SELECT t.id, t.name, t.category, t.output,
+               json_agg(json_build_object('name', ti.name, 'gross', ti.gross, 'net', ti.net, 'unit', ti.unit)
+                        ORDER BY ti.position) AS matched_ingredients
+        FROM products p
+        JOIN ttk_ingredients ti ON ti.restaurant_id = p.restaurant_id
+             AND (ti.product_id = p.id OR lower(ti.name) = lower(p.name))
+        JOIN ttk t ON t.id = ti.ttk_id
+        WHERE p.id = %s AND p.restaurant_id = %s
+        GROUP BY t.id
+        ORDER BY t.name, t.id
+    """, (product_id, restaurant_id))
+    ttk_list = [dict(row) for row in cur.fetchall()]
+    
+    cur.close()
+    conn.close()
+    
+    return json_response(200, {'ttk': ttk_list})
+
+
+COST_CACHE_MAX_RESTAURANTS = int(os.environ.get('COST_CACHE_MAX_RESTAURANTS', '64'))
+MAX_COST_OUTPUT = 10 ** 7
+MAX_COST_PORTIONS = 10 ** 5
+
+UNIT_FACTORS = {
+    'г': ('mass', Decimal('0.001')),
+    'гр': ('mass', Decimal('0.001')),
+    'кг': ('mass', Decimal('1')),
+    'мл': ('volume', Decimal('0.001')),
+    'л': ('volume', Decimal('1')),
+    'шт': ('piece', Decimal('1')),
+}
+
+_cost_trees = OrderedDict()
+_cost_lock = threading.Lock()
+
+
+def get_unit_factor(unit) -> tuple:
+    '''Вид единицы и множитель к базовой (кг, л, шт); «Кг.» и «кг» — одна единица'''
+    return UNIT_FACTORS.get((unit or '').strip(' .').lower(), (None, None))
+
+
+def to_base_units(quantity, unit) -> tuple:
+    '''Количество в базовой единице (кг, л, шт) и её вид; (None, None), если единица неизвестна'''
+    kind, factor = get_unit_factor(unit)
+    if kind is None or quantity is None:
+        return None, None
+    return kind, quantity * factor
+
+
+def build_cost_trees(dishes: list, lines: list, products: list) -> dict:
+    '''Себестоимость всех ТТК ресторана на их выход; полуфабрикаты (строки с названием другой ТТК) считаются один раз'''
+    dishes_by_id = {row[0]: row for row in dishes}
+    dish_ids_by_name = {}
+    for row in dishes:
+        dish_ids_by_name.setdefault(row[1].lower(), row[0])
+    products_by_id = {row[0]: row for row in products}
+    products_by_name = {}
+    for row in products:
+        products_by_name.setdefault(row[1].lower(), row)
+    lines_by_dish = {}
+    for row in lines:
+        lines_by_dish.setdefault(row[0], []).append(row)
+    
+    trees = {}
+    visiting = set()
+    
+    def cost_of(ttk_id):
+        if ttk_id in trees:
+            return trees[ttk_id]
+        if ttk_id in visiting:
+            return None
+        visiting.add(ttk_id)
         
-        elif method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            
-            if action == 'create_ttk':
-                return create_ttk(body)
-            elif action == 'update_ttk':
-                return update_ttk(body)
-            elif action == 'delete_ttk':
-                return delete_ttk(body)
-            elif action == 'create_checklist':
-                return create_checklist(body)
-            elif action == 'update_checklist':
-                return update_checklist(body)
-            elif action == 'delete_checklist':
-                return delete_checklist(body)
-            elif action == 'update_checklist_item':
-                return update_checklist_item(body)
+        _, name, category, output = dishes_by_id[ttk_id]
+        total = Decimal(0)
+        items = []
+        missing = []
+        for _, _, line_name, product_id, gross, net, unit in lines_by_dish.get(ttk_id, ()):
+            kind, amount = to_base_units(gross if gross is not None else net, unit)
+            item = {'name': line_name, 'gross': gross, 'net': net, 'unit': unit, 'cost': None}
+            semi_id = dish_ids_by_name.get(line_name.lower())
+            if semi_id is not None and semi_id != ttk_id:
+                semi = cost_of(semi_id)
+                item['semiId'] = semi_id
+                if semi is None:
+                    item['error'] = 'cycle'
+                elif kind == 'piece':
+                    item['cost'] = amount * semi['cost']
+                elif kind is not None and semi['output']:
+                    item['cost'] = amount * 1000 / semi['output'] * semi['cost']
+                else:
+                    item['error'] = 'unit_mismatch'
+                if semi and semi['missing']:
+                    item['incomplete'] = True
+            else:
+                product = products_by_id.get(product_id) or products_by_name.get(line_name.lower())
+                product_kind, product_factor = get_unit_factor(product[2] if product else None)
+                if product is None:
+                    item['error'] = 'no_product'
+                elif product[3] is None:
+                    item['error'] = 'no_price'
+                elif kind is None or kind != product_kind:
+                    item['error'] = 'unit_mismatch'
+                else:
+                    item['productId'] = product[0]
+                    item['price'] = product[3]
+                    item['cost'] = amount / product_factor * product[3]
+            if item['cost'] is None or item.get('incomplete'):
+                missing.append(line_name)
+            if item['cost'] is not None:
+                total += item['cost']
+            items.append(item)
         
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid action'}),
-            'isBase64Encoded': False
+        visiting.discard(ttk_id)
+        trees[ttk_id] = {
+            'id': ttk_id,
+            'name': name,
+            'category': category,
+            'output': output or 0,
+            'cost': total,
+            'missing': missing,
+            'lines': items,
         }
+        return trees[ttk_id]
     
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+    for ttk_id in dishes_by_id:
+        cost_of(ttk_id)
+    return trees
 
 
-def get_db_connection():
-    '''Подключение к базе данных'''
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+def get_cost_trees(conn, restaurant_id) -> tuple:
+    '''Ключ версий (ttk, products) и деревья себестоимости; пересчёт только после записи ТТК или продуктов'''
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT resource, version FROM resource_versions WHERE restaurant_id = %s AND resource IN ('ttk', 'products')",
+        (restaurant_id,)
+    )
+    versions = dict(cur.fetchall())
+    key = (versions.get('ttk', 0), versions.get('products', 0))
+    
+    with _cost_lock:
+        cached = _cost_trees.get(str(restaurant_id))
+        if cached is not None and cached[0] == key:
+            _cost_trees.move_to_end(str(restaurant_id))
+            cur.close()
+            return key, cached[1]
+    
+    cur.execute("SELECT id, name, category, output FROM ttk WHERE restaurant_id = %s ORDER BY id", (restaurant_id,))
+    dishes = cur.fetchall()
+    cur.execute("""
+        SELECT ttk_id, position, name, product_id, gross, net, unit FROM ttk_ingredients
+        WHERE restaurant_id = %s ORDER BY ttk_id, position
+    """, (restaurant_id,))
+    lines = cur.fetchall()
+    cur.execute("SELECT id, name, unit, price FROM products WHERE restaurant_id = %s ORDER BY id", (restaurant_id,))
+    products = cur.fetchall()
+    cur.close()
+    
+    trees = build_cost_trees(dishes, lines, products)
+    with _cost_lock:
+        _cost_trees[str(restaurant_id)] = (key, trees)
+        _cost_trees.move_to_end(str(restaurant_id))
+        while len(_cost_trees) > COST_CACHE_MAX_RESTAURANTS:
+            _cost_trees.popitem(last=False)
+    return key, trees
 
 
-def get_ttk(event: dict) -> dict:
-    '''Получение списка ТТК ресторана'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+def make_cost_etag(key: tuple, params: dict) -> str:
+    '''ETag расчёта себестоимости: зависит от версий ТТК и продуктов'''
+    digest = zlib.crc32(json.dumps(params, sort_keys=True, default=str).encode())
+    return f'"cost-{key[0]}-{key[1]}-{digest:08x}"'
+
+
+def money(value):
+    '''Сумма с точностью до копейки'''
+    return None if value is None else value.quantize(Decimal('0.01'))
+
+
+def scale_cost_tree(tree: dict, factor: Decimal) -> dict:
+    '''Раскладка ТТК, пересчитанная на factor выходов'''
+    def scaled(value):
+        return None if value is None else (value * factor).quantize(Decimal('0.001'))
     
+    output = tree['output']
+    return {
+        'id': tree['id'],
+        'name': tree['name'],
+        'output': output,
+        'targetOutput': scaled(Decimal(output)),
+        'factor': factor.quantize(Decimal('0.0001')),
+        'cost': money(tree['cost'] * factor),
+        'costPerPortion': money(tree['cost']),
+        'costPerKg': money(tree['cost'] * 1000 / output) if output else None,
+        'missing': tree['missing'],
+        'lines': [
+            {**line, 'gross': scaled(line['gross']), 'net': scaled(line['net']),
+             'cost': money(None if line['cost'] is None else line['cost'] * factor)}
+            for line in tree['lines']
+        ],
+    }
+
+
+def parse_cost_scale(value, limit: int):
+    '''Выход или число порций для пересчёта: конечное число в (0, limit]; None, если не задано'''
+    if not value:
+        return None
+    number = Decimal(value)
+    if not number.is_finite() or number <= 0 or number > limit:
+        raise ValueError('Invalid scale')
+    return number
+
+
+def get_ttk_cost(event: dict) -> dict:
+    '''Себестоимость и раскладка ТТК на заданный выход (output, г) или число порций (portions)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    
+    try:
+        ttk_id = int(params.get('id'))
+        output = parse_cost_scale(params.get('output'), MAX_COST_OUTPUT)
+        portions = parse_cost_scale(params.get('portions'), MAX_COST_PORTIONS)
+    except (TypeError, ValueError, ArithmeticError):
+        return json_response(400, {'error': 'Invalid parameters'})
     if not restaurant_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing restaurantId'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Invalid parameters'})
     
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    key, trees = get_cost_trees(conn, restaurant_id)
+    conn.close()
     
-    cur.execute(
-        "SELECT * FROM ttk WHERE restaurant_id = %s ORDER BY created_at DESC",
-        (restaurant_id,)
-    )
-    ttk_list = [dict(row) for row in cur.fetchall()]
+    tree = trees.get(ttk_id)
+    if tree is None:
+        return json_response(404, {'error': 'TTK not found'})
     
-    cur.close()
+    etag = make_cost_etag(key, params)
+    if is_not_modified(event, etag):
+        return not_modified_response(etag)
+    
+    if output is not None:
+        if not tree['output']:
+            return json_response(400, {'error': 'TTK has no output'})
+        factor = output / tree['output']
+    else:
+        factor = portions or Decimal(1)
+    
+    return json_response(200, {'cost': scale_cost_tree(tree, factor)}, etag_headers(etag))
+
+
+def get_menu_cost(event: dict) -> dict:
+    '''Себестоимость всех ТТК ресторана на выход: итог, на 1 кг и позиции без цены'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    
+    if not restaurant_id:
+        return json_response(400, {'error': 'Missing restaurantId'})
+    
+    conn = get_db_connection()
+    key, trees = get_cost_trees(conn, restaurant_id)
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'ttk': ttk_list}, default=str),
-        'isBase64Encoded': False
-    }
+    etag = make_cost_etag(key, params)
+    if is_not_modified(event, etag):
+        return not_modified_response(etag)
+    
+    menu = [
+        {
+            'id': tree['id'],
+            'name': tree['name'],
+            'category': tree['category'],
+            'output': tree['output'],
+            'cost': money(tree['cost']),
+            'costPerKg': money(tree['cost'] * 1000 / tree['output']) if tree['output'] else None,
+            'missing': tree['missing'],
+        }
+        for tree in sorted(trees.values(), key=lambda tree: (tree['category'], tree['name'], tree['id']))
+    ]
+    
+    return json_response(200, {'menu': menu}, etag_headers(etag))
 
 
-def create_ttk(body: dict) -> dict:
+def create_ttk(event: dict) -> dict:
     '''Создание новой ТТК'''
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     name = body.get('name')
     category = body.get('category')
@@ -109,12 +421,7 @@ def create_ttk(body: dict) -> dict:
     tech = body.get('tech', '')
     
     if not all([restaurant_id, name, category, ingredients]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -124,21 +431,20 @@ def create_ttk(body: dict) -> dict:
         (restaurant_id, name, category, output, ingredients, tech)
     )
     ttk = dict(cur.fetchone())
+    sync_ttk_ingredients(cur, [(ttk['id'], ttk['restaurant_id'], ttk['ingredients'])])
+    
+    bump_versions(cur, restaurant_id, 'ttk')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'ttk': ttk}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'ttk': ttk})
 
 
-def update_ttk(body: dict) -> dict:
+def update_ttk(event: dict) -> dict:
     '''Обновление ТТК'''
+    body = get_body(event)
     ttk_id = body.get('id')
     name = body.get('name')
     category = body.get('category')
@@ -147,12 +453,7 @@ def update_ttk(body: dict) -> dict:
     tech = body.get('tech', '')
     
     if not all([ttk_id, name, category, ingredients]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -166,75 +467,173 @@ def update_ttk(body: dict) -> dict:
     if not ttk:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'TTK not found'}),
-            'isBase64Encoded': False
-        }
+        return json_response(404, {'error': 'TTK not found'})
     
     ttk = dict(ttk)
+    sync_ttk_ingredients(cur, [(ttk['id'], ttk['restaurant_id'], ttk['ingredients'])])
+    bump_versions(cur, ttk['restaurant_id'], 'ttk')
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'ttk': ttk}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'ttk': ttk})
 
 
-def delete_ttk(body: dict) -> dict:
+def delete_ttk(event: dict) -> dict:
     '''Удаление ТТК'''
+    body = get_body(event)
     ttk_id = body.get('id')
     
     if not ttk_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing id'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing id'})
     
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute("DELETE FROM ttk WHERE id = %s", (ttk_id,))
+    cur.execute("DELETE FROM ttk_ingredients WHERE ttk_id = %s", (ttk_id,))
+    cur.execute("DELETE FROM ttk WHERE id = %s RETURNING restaurant_id", (ttk_id,))
+    ttk = cur.fetchone()
+    if ttk:
+        bump_versions(cur, ttk[0], 'ttk')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
+
+
+MAX_INTEGER = 2 ** 31 - 1
+
+
+def import_ttk(event: dict) -> dict:
+    '''Массовый импорт ТТК из CSV или JSON: COPY во временную таблицу и upsert по названию'''
+    body = get_body(event)
+    restaurant_id = body.get('restaurantId')
+    
+    if not restaurant_id:
+        return json_response(400, {'error': 'Missing required fields'})
+    
+    try:
+        rows = read_import_rows(body, ('name', 'category', 'ingredients'))
+    except ValueError as e:
+        return json_response(400, {'error': str(e)})
+    
+    valid = []
+    errors = []
+    seen = {}
+    for row_no, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': row_no, 'error': 'Row must be an object'})
+            continue
+        name = str(row.get('name') or '').strip()
+        category = str(row.get('category') or '').strip()
+        ingredients = str(row.get('ingredients') or '').strip()
+        tech = str(row.get('tech') or '')
+        try:
+            output = int(row.get('output') or 0)
+        except (TypeError, ValueError, OverflowError):
+            output = -1
+        if not (name and category and ingredients):
+            error = 'Missing name, category or ingredients'
+        elif len(name) > 255 or len(category) > 100:
+            error = 'Value too long'
+        elif not 0 <= output <= MAX_INTEGER:
+            error = 'Invalid output'
+        elif name in seen:
+            error = 'Duplicate of row %d' % seen[name]
+        else:
+            seen[name] = row_no
+            valid.append((row_no, name, category, output, ingredients, tech))
+            continue
+        errors.append({'row': row_no, 'error': error})
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    cur.execute("""
+        CREATE TEMP TABLE ttk_import (
+            row_no INTEGER, name VARCHAR(255), category VARCHAR(100), output INTEGER, ingredients TEXT, tech TEXT
+        ) ON COMMIT DROP
+    """)
+    copy_rows(cur, 'ttk_import', ('row_no', 'name', 'category', 'output', 'ingredients', 'tech'), valid)
+    cur.execute("ANALYZE ttk_import")
+    
+    cur.execute("""
+        UPDATE ttk t
+        SET category = i.category, output = i.output, ingredients = i.ingredients, tech = i.tech
+        FROM ttk_import i
+        WHERE t.restaurant_id = %s AND t.name = i.name
+          AND (t.category, t.output, t.ingredients, t.tech) IS DISTINCT FROM (i.category, i.output, i.ingredients, i.tech)
+        RETURNING t.id, t.restaurant_id, t.ingredients
+    """, (restaurant_id,))
+    changed = cur.fetchall()
+    updated = len(changed)
+    
+    cur.execute("""
+        INSERT INTO ttk (restaurant_id, name, category, output, ingredients, tech)
+        SELECT %s, i.name, i.category, i.output, i.ingredients, i.tech
+        FROM ttk_import i
+        WHERE NOT EXISTS (SELECT 1 FROM ttk t WHERE t.restaurant_id = %s AND t.name = i.name)
+        ORDER BY i.row_no
+        RETURNING id, restaurant_id, ingredients
+    """, (restaurant_id, restaurant_id))
+    created = cur.fetchall()
+    inserted = len(created)
+    
+    sync_ttk_ingredients(cur, changed + created)
+    
+    if inserted or updated:
+        bump_versions(cur, restaurant_id, 'ttk')
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+    
+    return json_response(200, {
+        'imported': {
+            'inserted': inserted,
+            'updated': updated,
+            'unchanged': len(valid) - inserted - updated,
+        },
+        'errors': errors,
+    })
 
 
 def get_checklists(event: dict) -> dict:
-    '''Получение чек-листов с пунктами'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+    '''Получение чек-листов с пунктами (постранично при заданных limit/cursor)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
     if not restaurant_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing restaurantId'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing restaurantId'})
+    
+    try:
+        limit, after = get_page_params(params, 2)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid pagination parameters'})
+    
+    query = "SELECT * FROM checklists WHERE restaurant_id = %s"
+    args = [restaurant_id]
+    if after:
+        query += " AND (created_at, id) < (%s, %s)"
+        args += after
+    query += " ORDER BY created_at DESC, id DESC"
+    if limit:
+        query += " LIMIT %s"
+        args.append(limit + 1)
     
     conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'checklists')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute(
-        "SELECT * FROM checklists WHERE restaurant_id = %s ORDER BY created_at DESC",
-        (restaurant_id,)
-    )
-    checklists = [dict(row) for row in cur.fetchall()]
+    cur.execute(query, args)
+    checklists, next_cursor = split_page([dict(row) for row in cur.fetchall()], limit, ('created_at', 'id'))
     
     for checklist in checklists:
         cur.execute(
@@ -246,16 +645,26 @@ def get_checklists(event: dict) -> dict:
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'checklists': checklists}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'checklists': checklists, 'nextCursor': next_cursor}, etag_headers(etag))
+
 
+def insert_checklist_items(cur, rows: list) -> list:
+    '''Вставка пунктов чек-листа одним запросом, результат в порядке item_order'''
+    if not rows:
+        return []
+    inserted = execute_values(
+        cur,
+        "INSERT INTO checklist_items (checklist_id, text, status, timestamp, item_order) VALUES %s RETURNING *",
+        rows,
+        page_size=len(rows),
+        fetch=True
+    )
+    return sorted((dict(row) for row in inserted), key=lambda item: item['item_order'])
 
-def create_checklist(body: dict) -> dict:
+
+def create_checklist(event: dict) -> dict:
     '''Создание нового чек-листа'''
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     name = body.get('name')
     workshop = body.get('workshop')
@@ -263,12 +672,7 @@ def create_checklist(body: dict) -> dict:
     items = body.get('items', [])
     
     if not all([restaurant_id, name, workshop]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -279,43 +683,33 @@ def create_checklist(body: dict) -> dict:
     )
     checklist = dict(cur.fetchone())
     
-    checklist_items = []
-    for idx, item in enumerate(items):
-        cur.execute(
-            "INSERT INTO checklist_items (checklist_id, text, item_order) VALUES (%s, %s, %s) RETURNING *",
-            (checklist['id'], item['text'], idx)
-        )
-        checklist_items.append(dict(cur.fetchone()))
+    checklist['items'] = insert_checklist_items(
+        cur,
+        [(checklist['id'], item['text'], 'pending', None, idx) for idx, item in enumerate(items)]
+    )
     
-    checklist['items'] = checklist_items
+    bump_versions(cur, restaurant_id, 'checklists')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'checklist': checklist}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'checklist': checklist})
 
 
-def update_checklist(body: dict) -> dict:
-    '''Обновление чек-листа'''
+def update_checklist(event: dict) -> dict:
+    '''Обновление чек-листа: пункты сравниваются по id, у существующих меняются только текст и порядок'''
+    body = get_body(event)
     checklist_id = body.get('id')
     name = body.get('name')
     workshop = body.get('workshop')
     responsible = body.get('responsible')
-    items = body.get('items', [])
+    items = body.get('items')
     
     if not all([checklist_id, name, workshop]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
+    if items is not None and not (isinstance(items, list) and all(isinstance(item, dict) and item.get('text') for item in items)):
+        return json_response(400, {'error': 'Invalid items'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
@@ -329,110 +723,147 @@ def update_checklist(body: dict) -> dict:
     if not checklist:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Checklist not found'}),
-            'isBase64Encoded': False
-        }
+        return json_response(404, {'error': 'Checklist not found'})
     
     checklist = dict(checklist)
     
-    cur.execute("DELETE FROM checklist_items WHERE checklist_id = %s", (checklist_id,))
-    
-    checklist_items = []
-    for idx, item in enumerate(items):
-        cur.execute(
-            "INSERT INTO checklist_items (checklist_id, text, status, timestamp, item_order) VALUES (%s, %s, %s, %s, %s) RETURNING *",
-            (checklist_id, item.get('text'), item.get('status', 'pending'), item.get('timestamp'), idx)
-        )
-        checklist_items.append(dict(cur.fetchone()))
-    
-    checklist['items'] = checklist_items
+    cur.execute(
+        "SELECT * FROM checklist_items WHERE checklist_id = %s FOR UPDATE",
+        (checklist_id,)
+    )
+    existing = {row['id']: dict(row) for row in cur.fetchall()}
+    
+    # Статус и время отметки меняет только update_checklist_item: форма редактирования
+    # присылает снимок на момент открытия, и он не должен затирать отметки поваров
+    unchanged, to_update, to_insert = [], [], []
+    if items is None:
+        unchanged, existing = list(existing.values()), {}
+    for idx, item in enumerate(items or []):
+        current = existing.pop(item.get('id'), None)
+        if current is None:
+            to_insert.append((checklist_id, item['text'], item.get('status', 'pending'), item.get('timestamp'), idx))
+        elif (item['text'], idx) == (current['text'], current['item_order']):
+            unchanged.append(current)
+        else:
+            to_update.append((current['id'], item['text'], idx))
+    deleted_ids = list(existing)
+    
+    if deleted_ids:
+        cur.execute("DELETE FROM checklist_items WHERE id = ANY(%s)", (deleted_ids,))
+    
+    updated = []
+    if to_update:
+        updated = [dict(row) for row in execute_values(
+            cur,
+            """
+            UPDATE checklist_items AS ci
+            SET text = v.text, item_order = v.item_order
+            FROM (VALUES %s) AS v(id, text, item_order)
+            WHERE ci.id = v.id
+            RETURNING ci.*
+            """,
+            to_update,
+            template="(%s, %s, %s)",
+            page_size=len(to_update),
+            fetch=True
+        )]
+    
+    inserted = insert_checklist_items(cur, to_insert)
+    
+    checklist['items'] = sorted(unchanged + updated + inserted, key=lambda item: item['item_order'])
+    
+    bump_versions(cur, checklist['restaurant_id'], 'checklists')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'checklist': checklist}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {
+        'checklist': checklist,
+        'changes': {
+            'inserted': [item['id'] for item in inserted],
+            'updated': [item['id'] for item in updated],
+            'deleted': deleted_ids
+        }
+    })
 
 
-def delete_checklist(body: dict) -> dict:
+def delete_checklist(event: dict) -> dict:
     '''Удаление чек-листа'''
+    body = get_body(event)
     checklist_id = body.get('id')
     
     if not checklist_id:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing id'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing id'})
     
     conn = get_db_connection()
     cur = conn.cursor()
     
     cur.execute("DELETE FROM checklist_items WHERE checklist_id = %s", (checklist_id,))
-    cur.execute("DELETE FROM checklists WHERE id = %s", (checklist_id,))
+    cur.execute("DELETE FROM checklists WHERE id = %s RETURNING restaurant_id", (checklist_id,))
+    checklist = cur.fetchone()
+    if checklist:
+        bump_versions(cur, checklist[0], 'checklists')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
 
 
-def update_checklist_item(body: dict) -> dict:
+def update_checklist_item(event: dict) -> dict:
     '''Обновление статуса пункта чек-листа'''
+    body = get_body(event)
     item_id = body.get('itemId')
     status = body.get('status')
     timestamp = body.get('timestamp')
     
     if not all([item_id, status]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Missing required fields'}),
-            'isBase64Encoded': False
-        }
+        return json_response(400, {'error': 'Missing required fields'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute(
-        "UPDATE checklist_items SET status = %s, timestamp = %s WHERE id = %s RETURNING *",
-        (status, timestamp, item_id)
-    )
+    cur.execute("""
+        UPDATE checklist_items ci SET status = %s, timestamp = %s
+        FROM checklists c
+        WHERE ci.id = %s AND c.id = ci.checklist_id
+        RETURNING ci.*, c.restaurant_id
+    """, (status, timestamp, item_id))
     item = cur.fetchone()
     
     if not item:
         cur.close()
         conn.close()
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Item not found'}),
-            'isBase64Encoded': False
-        }
+        return json_response(404, {'error': 'Item not found'})
     
     item = dict(item)
+    bump_versions(cur, item.pop('restaurant_id'), 'checklists', change={
+        'action': 'update_checklist_item',
+        'checklistId': item['checklist_id'],
+        'itemId': item['id'],
+        'status': item['status'],
+    })
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'item': item}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'item': item})
+
+
+ROUTES = {
+    ('GET', 'get_ttk'): get_ttk,
+    ('GET', 'get_ttk_by_product'): get_ttk_by_product,
+    ('GET', 'get_ttk_cost'): get_ttk_cost,
+    ('GET', 'get_menu_cost'): get_menu_cost,
+    ('GET', 'get_checklists'): get_checklists,
+    ('POST', 'create_ttk'): create_ttk,
+    ('POST', 'update_ttk'): update_ttk,
+    ('POST', 'delete_ttk'): delete_ttk,
+    ('POST', 'import_ttk'): import_ttk,
+    ('POST', 'create_checklist'): create_checklist,
+    ('POST', 'update_checklist'): update_checklist,
+    ('POST', 'delete_checklist'): delete_checklist,
+    ('POST', 'update_checklist_item'): update_checklist_item,
+}
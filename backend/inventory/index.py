@@ -1,166 +1,239 @@
-import json
-import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from decimal import Decimal
+import math
+from psycopg2.extras import RealDictCursor, execute_values
 
-DSN = os.environ['DATABASE_URL']
+from common import (
+    bump_versions, dispatch, dumps, etag_headers, export_response, get_body, get_db_connection,
+    get_etag, get_export_params, get_page_params, is_not_modified, iter_export_chunks,
+    json_response, json_rows, not_modified_response, raw_json_response, split_page
+)
 
-def get_db_connection():
-    return psycopg2.connect(DSN)
-
-def decimal_default(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError
 
 def handler(event: dict, context) -> dict:
     '''API для управления инвентаризацией в ресторане'''
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    action = event.get('queryStringParameters', {}).get('action', '')
+    return dispatch(event, ROUTES)
+
+def with_inventory_products(query: str, order_by: str) -> str:
+    '''Обернуть выборку инвентаризаций: продукты и записи собирает в JSON сам Postgres'''
+    return """
+        SELECT row_to_json(page)::text, page.completed_at, page.id
+        FROM (
+            SELECT inv.*, COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', ip.id,
+                    'name', ip.name,
+                    'type', ip.type,
+                    'product_order', ip.product_order,
+                    'entries', COALESCE((
+                        SELECT json_agg(json_build_object(
+                            'user_name', e.user_name,
+                            'quantity', e.quantity,
+                            'created_at', e.created_at
+                        ) ORDER BY e.created_at, e.id)
+                        FROM t_p93487342_chefassist_kitchen_m.inventory_entries e
+                        WHERE e.inventory_product_id = ip.id
+                    ), '[]')
+                ) ORDER BY ip.product_order, ip.name)
+                FROM t_p93487342_chefassist_kitchen_m.inventory_products ip
+                WHERE ip.inventory_id = inv.id
+            ), '[]') AS products
+            FROM (%s) inv
+        ) page
+        ORDER BY %s
+    """ % (query, order_by)
+
+def load_inventory_totals(cur, inventories: list, materialized: bool = False) -> None:
+    '''Итоги по продуктам вместо записей: сумма, число записей, участники, время последней записи'''
+    products_by_inventory = {inventory['id']: [] for inventory in inventories}
+    if not products_by_inventory:
+        return
     
-    try:
-        if action == 'get_active_inventory':
-            return get_active_inventory(event)
-        elif action == 'get_inventory_history':
-            return get_inventory_history(event)
-        elif action == 'create_inventory':
-            return create_inventory(event)
-        elif action == 'add_entry':
-            return add_entry(event)
-        elif action == 'complete_inventory':
-            return complete_inventory(event)
-        elif action == 'delete_inventory':
-            return delete_inventory_func(event)
-        else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Unknown action'}),
-                'isBase64Encoded': False
-            }
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+    if materialized:
+        cur.execute("""
+            SELECT ip.id, ip.inventory_id, ip.name, ip.type, ip.product_order,
+                   COALESCE(t.total_quantity, 0) AS total_quantity,
+                   COALESCE(t.entries_count, 0) AS entries_count,
+                   COALESCE(t.contributors, '{}') AS contributors,
+                   t.last_entry_at
+            FROM t_p93487342_chefassist_kitchen_m.inventory_products ip
+            LEFT JOIN t_p93487342_chefassist_kitchen_m.inventory_totals t
+                ON t.inventory_product_id = ip.id AND t.inventory_id = ANY(%(ids)s)
+            WHERE ip.inventory_id = ANY(%(ids)s)
+            ORDER BY ip.inventory_id, ip.product_order, ip.name
+        """, {'ids': list(products_by_inventory)})
+    else:
+        cur.execute("""
+            SELECT ip.id, ip.inventory_id, ip.name, ip.type, ip.product_order,
+                   COALESCE(SUM(e.quantity), 0) AS total_quantity,
+                   COUNT(e.id) AS entries_count,
+                   COALESCE(array_agg(DISTINCT e.user_name) FILTER (WHERE e.id IS NOT NULL), '{}') AS contributors,
+                   MAX(e.created_at) AS last_entry_at
+            FROM t_p93487342_chefassist_kitchen_m.inventory_products ip
+            LEFT JOIN t_p93487342_chefassist_kitchen_m.inventory_entries e ON e.inventory_product_id = ip.id
+            WHERE ip.inventory_id = ANY(%s)
+            GROUP BY ip.id
+            ORDER BY ip.inventory_id, ip.product_order, ip.name
+        """, (list(products_by_inventory),))
+    
+    for product in cur.fetchall():
+        products_by_inventory[product.pop('inventory_id')].append(product)
+    
+    for inventory in inventories:
+        inventory['products'] = products_by_inventory[inventory['id']]
 
 def get_active_inventory(event: dict) -> dict:
-    '''Получить активную инвентаризацию ресторана'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+    '''Получить активную инвентаризацию ресторана (view=totals — итоги вместо записей)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
     
-    cur.execute("""
-        SELECT id, restaurant_id, name, date, responsible, status, created_at, completed_at
+    etag = get_etag(conn, params, 'inventory')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    query = """
+        SELECT id, restaurant_id, name, date, responsible, status, created_at, completed_at, change_seq
         FROM t_p93487342_chefassist_kitchen_m.inventories
         WHERE restaurant_id = %s AND status = 'in_progress'
         ORDER BY created_at DESC
         LIMIT 1
-    """, (restaurant_id,))
+    """
+    
+    if params.get('view') == 'totals':
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(query, (restaurant_id,))
+        inventory = cur.fetchone()
+        if inventory:
+            load_inventory_totals(cur, [inventory])
+        response = json_response(200, {'inventory': inventory}, etag_headers(etag))
+    else:
+        cur = conn.cursor()
+        cur.execute(with_inventory_products(query, 'page.created_at DESC'), (restaurant_id,))
+        row = cur.fetchone()
+        response = raw_json_response(200, {'inventory': row[0] if row else 'null'}, etag_headers(etag))
     
-    inventory = cur.fetchone()
+    cur.close()
+    conn.close()
     
-    if inventory:
-        cur.execute("""
-            SELECT id, name, type, product_order
-            FROM t_p93487342_chefassist_kitchen_m.inventory_products
-            WHERE inventory_id = %s
-            ORDER BY product_order, name
-        """, (inventory['id'],))
-        
-        products = cur.fetchall()
-        
-        for product in products:
-            cur.execute("""
-                SELECT user_name, quantity, created_at
-                FROM t_p93487342_chefassist_kitchen_m.inventory_entries
-                WHERE inventory_product_id = %s
-                ORDER BY created_at
-            """, (product['id'],))
-            
-            product['entries'] = cur.fetchall()
-        
-        inventory['products'] = products
+    return response
+
+def get_inventory_history(event: dict) -> dict:
+    '''Получить историю инвентаризаций ресторана постранично (view=totals — сохранённые итоги)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    
+    try:
+        limit, after = get_page_params(params, 2, default_limit=20)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid pagination parameters'})
+    
+    query = """
+        SELECT id, restaurant_id, name, date, responsible, status, created_at, completed_at
+        FROM t_p93487342_chefassist_kitchen_m.inventories
+        WHERE restaurant_id = %s AND status = 'completed'
+    """
+    args = [restaurant_id]
+    if after:
+        query += " AND (completed_at, id) < (%s, %s)"
+        args += after
+    query += " ORDER BY completed_at DESC, id DESC LIMIT %s"
+    args.append(limit + 1)
+    
+    conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'inventory')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    if params.get('view') == 'totals':
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute(query, args)
+        inventories, next_cursor = split_page(cur.fetchall(), limit, ('completed_at', 'id'))
+        load_inventory_totals(cur, inventories, materialized=True)
+        response = json_response(200, {'inventories': inventories, 'nextCursor': next_cursor}, etag_headers(etag))
+    else:
+        cur = conn.cursor()
+        cur.execute(with_inventory_products(query, 'page.completed_at DESC, page.id DESC'), args)
+        inventories, next_cursor = split_page(cur.fetchall(), limit, (1, 2))
+        response = raw_json_response(200, {'inventories': json_rows(inventories), 'nextCursor': dumps(next_cursor)}, etag_headers(etag))
     
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'inventory': dict(inventory) if inventory else None}, default=str),
-        'isBase64Encoded': False
-    }
+    return response
 
-def get_inventory_history(event: dict) -> dict:
-    '''Получить историю инвентаризаций ресторана'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+def next_change_seq(cur, inventory_product_id):
+    '''Следующий номер изменения активной инвентаризации; строка заблокирована до commit, так что номера идут по порядку фиксации'''
+    cur.execute("""
+        UPDATE t_p93487342_chefassist_kitchen_m.inventories i
+        SET change_seq = i.change_seq + 1
+        FROM t_p93487342_chefassist_kitchen_m.inventory_products ip
+        WHERE ip.id = %s AND i.id = ip.inventory_id AND i.status = 'in_progress'
+        RETURNING i.id, i.restaurant_id, i.change_seq
+    """, (inventory_product_id,))
+    return cur.fetchone()
+
+def get_inventory_changes(event: dict) -> dict:
+    '''Изменения инвентаризации после номера since: новые записи и продукты'''
+    params = event.get('queryStringParameters', {})
+    inventory_id = params.get('inventoryId')
+    
+    try:
+        since = int(params.get('since', 0))
+    except ValueError:
+        since = None
+    if not inventory_id or since is None:
+        return json_response(400, {'error': 'Missing inventoryId or invalid since'})
     
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     cur.execute("""
-        SELECT id, restaurant_id, name, date, responsible, status, created_at, completed_at
+        SELECT id, status, completed_at
         FROM t_p93487342_chefassist_kitchen_m.inventories
-        WHERE restaurant_id = %s AND status = 'completed'
-        ORDER BY completed_at DESC
-        LIMIT 20
-    """, (restaurant_id,))
+        WHERE id = %s
+    """, (inventory_id,))
+    inventory = cur.fetchone()
     
-    inventories = cur.fetchall()
+    if not inventory:
+        cur.close()
+        conn.close()
+        return json_response(404, {'error': 'Inventory not found'})
     
-    for inventory in inventories:
-        cur.execute("""
-            SELECT id, name, type, product_order
-            FROM t_p93487342_chefassist_kitchen_m.inventory_products
-            WHERE inventory_id = %s
-            ORDER BY product_order, name
-        """, (inventory['id'],))
-        
-        products = cur.fetchall()
-        
-        for product in products:
-            cur.execute("""
-                SELECT user_name, quantity, created_at
-                FROM t_p93487342_chefassist_kitchen_m.inventory_entries
-                WHERE inventory_product_id = %s
-                ORDER BY created_at
-            """, (product['id'],))
-            
-            product['entries'] = cur.fetchall()
-        
-        inventory['products'] = products
+    cur.execute("""
+        SELECT id, name, type, product_order, change_seq
+        FROM t_p93487342_chefassist_kitchen_m.inventory_products
+        WHERE inventory_id = %s AND change_seq > %s
+        ORDER BY product_order, name
+    """, (inventory_id, since))
+    products = cur.fetchall()
+    
+    cur.execute("""
+        SELECT e.id, e.inventory_product_id, e.user_name, e.quantity, e.created_at, e.change_seq
+        FROM t_p93487342_chefassist_kitchen_m.inventory_entries e
+        JOIN t_p93487342_chefassist_kitchen_m.inventory_products ip ON ip.id = e.inventory_product_id
+        WHERE ip.inventory_id = %s AND e.change_seq > %s
+        ORDER BY e.change_seq, e.id
+    """, (inventory_id, since))
+    entries = cur.fetchall()
     
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'inventories': [dict(inv) for inv in inventories]}, default=str),
-        'isBase64Encoded': False
-    }
+    version = max([since] + [row['change_seq'] for row in products] + [row['change_seq'] for row in entries])
+    
+    return json_response(200, {
+        'inventory': dict(inventory),
+        'version': version,
+        'products': [dict(p) for p in products],
+        'entries': [dict(e) for e in entries]
+    })
 
 def create_inventory(event: dict) -> dict:
     '''Создать новую инвентаризацию'''
-    body = json.loads(event.get('body', '{}'))
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     name = body.get('name')
     date = body.get('date')
@@ -172,34 +245,34 @@ def create_inventory(event: dict) -> dict:
     
     cur.execute("""
         INSERT INTO t_p93487342_chefassist_kitchen_m.inventories 
-        (restaurant_id, name, date, responsible, status)
-        VALUES (%s, %s, %s, %s, 'in_progress')
+        (restaurant_id, name, date, responsible, status, change_seq)
+        VALUES (%s, %s, %s, %s, 'in_progress', 1)
         RETURNING id, restaurant_id, name, date, responsible, status, created_at
     """, (restaurant_id, name, date, responsible))
     
     inventory = cur.fetchone()
     
-    for idx, product in enumerate(products):
-        cur.execute("""
+    if products:
+        execute_values(cur, """
             INSERT INTO t_p93487342_chefassist_kitchen_m.inventory_products
-            (inventory_id, name, type, product_order)
-            VALUES (%s, %s, %s, %s)
-        """, (inventory['id'], product['name'], product.get('type', 'product'), idx))
+            (inventory_id, name, type, product_order, change_seq)
+            VALUES %s
+        """, [
+            (inventory['id'], product['name'], product.get('type', 'product'), idx, 1)
+            for idx, product in enumerate(products)
+        ], page_size=len(products))
+    
+    bump_versions(cur, restaurant_id, 'inventory')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'inventory': dict(inventory)}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'inventory': dict(inventory)})
 
 def add_entry(event: dict) -> dict:
     '''Добавить запись о количестве продукта'''
-    body = json.loads(event.get('body', '{}'))
+    body = get_body(event)
     inventory_product_id = body.get('inventoryProductId')
     user_name = body.get('userName')
     quantity = body.get('quantity')
@@ -207,29 +280,137 @@ def add_entry(event: dict) -> dict:
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
+    inventory = next_change_seq(cur, inventory_product_id)
+    if not inventory:
+        cur.close()
+        conn.close()
+        return json_response(404, {'error': 'Active inventory product not found'})
+    
     cur.execute("""
         INSERT INTO t_p93487342_chefassist_kitchen_m.inventory_entries
-        (inventory_product_id, user_name, quantity)
-        VALUES (%s, %s, %s)
+        (inventory_product_id, user_name, quantity, change_seq)
+        VALUES (%s, %s, %s, %s)
         RETURNING id, inventory_product_id, user_name, quantity, created_at
-    """, (inventory_product_id, user_name, quantity))
+    """, (inventory_product_id, user_name, quantity, inventory['change_seq']))
     
     entry = cur.fetchone()
+    bump_versions(cur, inventory['restaurant_id'], 'inventory', change={
+        'action': 'add_entry',
+        'inventoryProductId': entry['inventory_product_id'],
+        'userName': entry['user_name'],
+        'quantity': entry['quantity'],
+    })
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'entry': dict(entry)}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'entry': dict(entry)})
+
+MAX_ENTRIES_BATCH = 1000
+MAX_CLIENT_KEY_LENGTH = 64
+MAX_ENTRY_QUANTITY = 10 ** 7
+
+def parse_batch_entry(entry) -> tuple:
+    '''Строка для вставки из записи пачки; ValueError с причиной, если запись не подходит'''
+    if not isinstance(entry, dict):
+        raise ValueError('Entry must be an object')
+    client_key = entry.get('clientKey')
+    if not isinstance(client_key, str) or not 0 < len(client_key) <= MAX_CLIENT_KEY_LENGTH:
+        raise ValueError(f'clientKey must be a string of 1-{MAX_CLIENT_KEY_LENGTH} characters')
+    user_name = entry.get('userName')
+    if not isinstance(user_name, str) or not 0 < len(user_name) <= 255:
+        raise ValueError('Invalid userName')
+    try:
+        inventory_product_id = int(entry['inventoryProductId'])
+        quantity = float(entry['quantity'])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise ValueError('Invalid inventoryProductId or quantity')
+    if not math.isfinite(quantity) or abs(quantity) >= MAX_ENTRY_QUANTITY:
+        raise ValueError('Invalid quantity')
+    return inventory_product_id, user_name, quantity, client_key
+
+def add_entries(event: dict) -> dict:
+    '''Добавить пачку записей одним запросом; повтор с тем же clientKey не задваивает остатки'''
+    body = get_body(event)
+    inventory_id = body.get('inventoryId')
+    entries = body.get('entries', [])
+    
+    if not inventory_id or not entries or not isinstance(entries, list) or len(entries) > MAX_ENTRIES_BATCH:
+        return json_response(400, {'error': f'Missing inventoryId or entries (up to {MAX_ENTRIES_BATCH})'})
+    
+    rows, rejected = {}, []
+    for index, entry in enumerate(entries):
+        try:
+            row = parse_batch_entry(entry)
+        except ValueError as e:
+            client_key = entry.get('clientKey') if isinstance(entry, dict) else None
+            rejected.append({'index': index, 'clientKey': client_key, 'error': str(e)})
+            continue
+        rows.setdefault(row[3], (index, row))
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    cur.execute("""
+        SELECT restaurant_id, change_seq
+        FROM t_p93487342_chefassist_kitchen_m.inventories
+        WHERE id = %s AND status = 'in_progress'
+        FOR UPDATE
+    """, (inventory_id,))
+    inventory = cur.fetchone()
+    
+    if not inventory:
+        cur.close()
+        conn.close()
+        return json_response(404, {'error': 'Active inventory not found'})
+    
+    cur.execute("""
+        SELECT id FROM t_p93487342_chefassist_kitchen_m.inventory_products
+        WHERE inventory_id = %s AND id = ANY(%s)
+    """, (inventory_id, list({row[0] for _, row in rows.values()})))
+    product_ids = {row['id'] for row in cur.fetchall()}
+    
+    for client_key, (index, row) in list(rows.items()):
+        if row[0] not in product_ids:
+            rejected.append({'index': index, 'clientKey': client_key, 'error': 'Inventory product not found'})
+            del rows[client_key]
+    
+    # Номер изменения расходуется только при вставке: полностью повторная пачка не трогает версии
+    change_seq = inventory['change_seq'] + 1
+    accepted = []
+    if rows:
+        accepted = execute_values(cur, """
+            INSERT INTO t_p93487342_chefassist_kitchen_m.inventory_entries
+            (inventory_product_id, user_name, quantity, client_key, change_seq)
+            VALUES %s
+            ON CONFLICT (client_key) DO NOTHING
+            RETURNING id, inventory_product_id, user_name, quantity, created_at, client_key
+        """, [row + (change_seq,) for _, row in rows.values()], page_size=len(rows), fetch=True)
+    
+    if accepted:
+        cur.execute(
+            "UPDATE t_p93487342_chefassist_kitchen_m.inventories SET change_seq = %s WHERE id = %s",
+            (change_seq, inventory_id)
+        )
+        bump_versions(cur, inventory['restaurant_id'], 'inventory')
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+    
+    accepted_keys = {entry['client_key'] for entry in accepted}
+    
+    return json_response(200, {
+        'accepted': [dict(entry) for entry in accepted],
+        'duplicates': [client_key for client_key in rows if client_key not in accepted_keys],
+        'rejected': sorted(rejected, key=lambda item: item['index']),
+        'version': change_seq if accepted else inventory['change_seq']
+    })
 
 def complete_inventory(event: dict) -> dict:
-    '''Завершить инвентаризацию'''
-    body = json.loads(event.get('body', '{}'))
+    '''Завершить инвентаризацию и сохранить итоги по продуктам'''
+    body = get_body(event)
     inventory_id = body.get('inventoryId')
     
     conn = get_db_connection()
@@ -238,26 +419,43 @@ def complete_inventory(event: dict) -> dict:
     cur.execute("""
         UPDATE t_p93487342_chefassist_kitchen_m.inventories
         SET status = 'completed', completed_at = CURRENT_TIMESTAMP
-        WHERE id = %s
+        WHERE id = %s AND status = 'in_progress'
         RETURNING id, restaurant_id, name, date, responsible, status, completed_at
     """, (inventory_id,))
     
     inventory = cur.fetchone()
+    if not inventory:
+        cur.close()
+        conn.close()
+        return json_response(404, {'error': 'Active inventory not found'})
+    
+    # Записи добавляются только в in_progress под блокировкой той же строки,
+    # поэтому после смены статуса итоги уже не разойдутся с историей записей
+    cur.execute("""
+        INSERT INTO t_p93487342_chefassist_kitchen_m.inventory_totals
+        (inventory_product_id, inventory_id, total_quantity, entries_count, contributors, last_entry_at)
+        SELECT ip.id, ip.inventory_id, SUM(e.quantity), COUNT(*), array_agg(DISTINCT e.user_name), MAX(e.created_at)
+        FROM t_p93487342_chefassist_kitchen_m.inventory_products ip
+        JOIN t_p93487342_chefassist_kitchen_m.inventory_entries e ON e.inventory_product_id = ip.id
+        WHERE ip.inventory_id = %s
+        GROUP BY ip.id, ip.inventory_id
+        ON CONFLICT (inventory_product_id) DO UPDATE SET
+            total_quantity = EXCLUDED.total_quantity,
+            entries_count = EXCLUDED.entries_count,
+            contributors = EXCLUDED.contributors,
+            last_entry_at = EXCLUDED.last_entry_at
+    """, (inventory_id,))
+    bump_versions(cur, inventory['restaurant_id'], 'inventory')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'inventory': dict(inventory)}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'inventory': dict(inventory)})
 
 def delete_inventory_func(event: dict) -> dict:
     '''Удалить инвентаризацию (только in_progress)'''
-    body = json.loads(event.get('body', '{}'))
+    body = get_body(event)
     inventory_id = body.get('inventoryId')
     
     conn = get_db_connection()
@@ -267,15 +465,66 @@ def delete_inventory_func(event: dict) -> dict:
         UPDATE t_p93487342_chefassist_kitchen_m.inventories
         SET status = 'cancelled'
         WHERE id = %s AND status = 'in_progress'
+        RETURNING restaurant_id
     """, (inventory_id,))
     
+    inventory = cur.fetchone()
+    if inventory:
+        bump_versions(cur, inventory[0], 'inventory')
+    
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
+
+def export_inventory_history(event: dict) -> dict:
+    '''Выгрузка записей завершённых инвентаризаций за период в CSV или JSON Lines (format, gzip, from, to)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    
+    try:
+        export_format, compress, date_from, date_to = get_export_params(params)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid export parameters'})
+    
+    query = """
+        SELECT i.id, i.name, i.date, i.completed_at, ip.name, ip.type, e.user_name, e.quantity, e.created_at
+        FROM t_p93487342_chefassist_kitchen_m.inventories i
+        JOIN t_p93487342_chefassist_kitchen_m.inventory_products ip ON ip.inventory_id = i.id
+        JOIN t_p93487342_chefassist_kitchen_m.inventory_entries e ON e.inventory_product_id = ip.id
+        WHERE i.restaurant_id = %s AND i.status = 'completed'
+    """
+    args = [restaurant_id]
+    if date_from:
+        query += " AND i.date >= %s"
+        args.append(date_from)
+    if date_to:
+        query += " AND i.date <= %s"
+        args.append(date_to)
+    query += " ORDER BY i.completed_at, i.id, ip.product_order, ip.name, e.created_at, e.id"
+    
+    columns = ['inventory_id', 'inventory', 'date', 'completed_at', 'product', 'type', 'user_name', 'quantity', 'created_at']
+    
+    conn = get_db_connection()
+    cur = conn.cursor('export_inventory_history')
+    cur.execute(query, args)
+    
+    response = export_response(iter_export_chunks(cur, columns, export_format), export_format, compress, 'inventory_history')
+    
+    cur.close()
+    conn.close()
+    
+    return response
+
+ROUTES = {
+    ('GET', 'get_active_inventory'): get_active_inventory,
+    ('GET', 'get_inventory_history'): get_inventory_history,
+    ('GET', 'get_inventory_changes'): get_inventory_changes,
+    ('GET', 'export_inventory_history'): export_inventory_history,
+    ('POST', 'create_inventory'): create_inventory,
+    ('POST', 'add_entry'): add_entry,
+    ('POST', 'add_entries'): add_entries,
+    ('POST', 'complete_inventory'): complete_inventory,
+    ('POST', 'delete_inventory'): delete_inventory_func,
+}
@@ -1,85 +1,149 @@
 '''API для управления продуктовой матрицей и заявками на продукты'''
 
-import json
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from psycopg2.extras import RealDictCursor, execute_values
 
-def get_db_connection():
-    dsn = os.environ.get('DATABASE_URL')
-    if not dsn:
-        raise Exception('DATABASE_URL not found')
-    return psycopg2.connect(dsn)
+from common import (
+    bump_versions, copy_rows, dispatch, dumps, etag_headers, export_response, get_body,
+    get_db_connection, get_etag, get_export_params, get_page_params, is_not_modified,
+    iter_export_chunks, json_response, json_rows, not_modified_response, raw_json_response,
+    read_import_rows, split_page
+)
+
+
+PRODUCT_CACHE_TTL = float(os.environ.get('PRODUCT_CACHE_TTL', '300'))
+PRODUCT_CACHE_MAX_BYTES = int(os.environ.get('PRODUCT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+PRODUCT_CACHE_URL = os.environ.get('PRODUCT_CACHE_URL', '')
+
+_product_cache = None
+
+class MemoryProductCache:
+    '''Кэш матрицы продуктов в памяти экземпляра: TTL, LRU по ресторанам и лимит объёма'''
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._restaurants = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, restaurant_id, key: str):
+        now = time.monotonic()
+        with self._lock:
+            entries = self._restaurants.get(str(restaurant_id))
+            entry = entries.get(key) if entries else None
+            if entry is None:
+                return None
+            if entry[0] < now:
+                del entries[key]
+                self.size -= entry[2]
+                return None
+            self._restaurants.move_to_end(str(restaurant_id))
+            return entry[1]
+
+    def set(self, restaurant_id, key: str, value: str) -> None:
+        # Объём считается в байтах UTF-8: названия в основном кириллицей, по 2 байта на символ
+        nbytes = len(value.encode('utf-8'))
+        if self.ttl <= 0 or nbytes > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            entries = self._restaurants.setdefault(str(restaurant_id), {})
+            for stale in [k for k, (expires_at, _, _) in entries.items() if k == key or expires_at < now]:
+                self.size -= entries.pop(stale)[2]
+            entries[key] = (now + self.ttl, value, nbytes)
+            self.size += nbytes
+            self._restaurants.move_to_end(str(restaurant_id))
+            while self.size > self.max_bytes:
+                _, evicted = self._restaurants.popitem(last=False)
+                self.size -= sum(cached_bytes for _, _, cached_bytes in evicted.values())
+
+    def invalidate(self, restaurant_id) -> None:
+        with self._lock:
+            entries = self._restaurants.pop(str(restaurant_id), None) or {}
+            self.size -= sum(cached_bytes for _, _, cached_bytes in entries.values())
+
+class RedisProductCache:
+    '''Общий для экземпляров кэш в Redis-совместимом хранилище; ошибки хранилища не ломают запрос'''
+
+    def __init__(self, url: str, ttl: float):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.errors = (redis.RedisError, OSError)
+        self.ttl = int(ttl)
+
+    def _key(self, restaurant_id) -> str:
+        return 'chefassist:products:%s' % restaurant_id
+
+    def get(self, restaurant_id, key: str):
+        try:
+            value = self.client.hget(self._key(restaurant_id), key)
+        except self.errors:
+            return None
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, restaurant_id, key: str, value: str) -> None:
+        if self.ttl <= 0:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(self._key(restaurant_id), key, value)
+            pipe.expire(self._key(restaurant_id), self.ttl)
+            pipe.execute()
+        except self.errors:
+            pass
+
+    def invalidate(self, restaurant_id) -> None:
+        try:
+            self.client.delete(self._key(restaurant_id))
+        except self.errors:
+            pass
+
+def get_product_cache():
+    '''Кэш категорий и продуктов: Redis при заданном PRODUCT_CACHE_URL, иначе память экземпляра'''
+    global _product_cache
+    if _product_cache is None:
+        if PRODUCT_CACHE_URL:
+            _product_cache = RedisProductCache(PRODUCT_CACHE_URL, PRODUCT_CACHE_TTL)
+        else:
+            _product_cache = MemoryProductCache(PRODUCT_CACHE_TTL, PRODUCT_CACHE_MAX_BYTES)
+    return _product_cache
+
+def cached_json_response(body: str, headers: dict = None) -> dict:
+    '''Ответ с готовым JSON-телом из кэша'''
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'X-Cache': 'HIT', **(headers or {})},
+        'body': body,
+        'isBase64Encoded': False
+    }
 
 def handler(event: dict, context) -> dict:
     '''API для управления продуктовой матрицей и заявками на продукты'''
-    method = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    action = event.get('queryStringParameters', {}).get('action', '')
-    
-    try:
-        if method == 'GET':
-            if action == 'get_categories':
-                return get_categories(event)
-            elif action == 'get_products':
-                return get_products(event)
-            elif action == 'get_orders':
-                return get_orders(event)
-        
-        elif method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            
-            if action == 'create_category':
-                return create_category(body)
-            elif action == 'create_product':
-                return create_product(body)
-            elif action == 'create_order':
-                return create_order(body)
-            elif action == 'update_order_item':
-                return update_order_item(body)
-            elif action == 'update_order_status':
-                return update_order_status(body)
-            elif action == 'delete_category':
-                return delete_category(body)
-            elif action == 'delete_product':
-                return delete_product(body)
-            elif action == 'update_category':
-                return update_category(body)
-            elif action == 'delete_order':
-                return delete_order(body)
-        
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid action'}),
-            'isBase64Encoded': False
-        }
-    
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+    return dispatch(event, ROUTES)
 
 def get_categories(event: dict) -> dict:
     '''Получение категорий продуктов'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
     conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'products')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    cache = get_product_cache()
+    cached = cache.get(restaurant_id, etag)
+    if cached is not None:
+        conn.close()
+        return cached_json_response(cached, etag_headers(etag))
+    
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     cur.execute(
@@ -91,78 +155,162 @@ def get_categories(event: dict) -> dict:
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'categories': [dict(c) for c in categories]}, default=str),
-        'isBase64Encoded': False
-    }
+    response = json_response(200, {'categories': [dict(c) for c in categories]}, etag_headers(etag))
+    cache.set(restaurant_id, etag, response['body'])
+    return response
 
 def get_products(event: dict) -> dict:
-    '''Получение продуктов'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+    '''Получение продуктов (постранично при заданных limit/cursor)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        limit, after = get_page_params(params, 3)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid pagination parameters'})
     
-    cur.execute("""
+    query = """
         SELECT p.*, pc.name as category_name 
         FROM products p
         JOIN product_categories pc ON p.category_id = pc.id
         WHERE p.restaurant_id = %s
-        ORDER BY pc.name, p.name
-    """, (restaurant_id,))
-    products = cur.fetchall()
+    """
+    args = [restaurant_id]
+    if after:
+        query += " AND (pc.name, p.name, p.id) > (%s, %s, %s)"
+        args += after
+    query += " ORDER BY pc.name, p.name, p.id"
+    if limit:
+        query += " LIMIT %s"
+        args.append(limit + 1)
+    query = """
+        SELECT row_to_json(page)::text, page.category_name, page.name, page.id
+        FROM (%s) page
+        ORDER BY page.category_name, page.name, page.id
+    """ % query
+    
+    conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'products')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    cache = get_product_cache()
+    cached = cache.get(restaurant_id, etag)
+    if cached is not None:
+        conn.close()
+        return cached_json_response(cached, etag_headers(etag))
+    
+    cur = conn.cursor()
+    
+    cur.execute(query, args)
+    products, next_cursor = split_page(cur.fetchall(), limit, (1, 2, 3))
     
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'products': [dict(p) for p in products]}, default=str),
-        'isBase64Encoded': False
-    }
+    response = raw_json_response(200, {'products': json_rows(products), 'nextCursor': dumps(next_cursor)}, etag_headers(etag))
+    cache.set(restaurant_id, etag, response['body'])
+    return response
 
 def get_orders(event: dict) -> dict:
-    '''Получение заявок'''
-    restaurant_id = event.get('queryStringParameters', {}).get('restaurantId')
+    '''Получение заявок (постранично при заданных limit/cursor)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
     
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        limit, after = get_page_params(params, 2)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid pagination parameters'})
     
-    cur.execute("""
+    query = """
         SELECT po.*, e.name as creator_name, e.role as creator_role
         FROM product_orders po
         JOIN employees e ON po.created_by = e.id
         WHERE po.restaurant_id = %s
-        ORDER BY po.created_at DESC
+    """
+    args = [restaurant_id]
+    if after:
+        query += " AND (po.created_at, po.id) < (%s, %s)"
+        args += after
+    query += " ORDER BY po.created_at DESC, po.id DESC"
+    if limit:
+        query += " LIMIT %s"
+        args.append(limit + 1)
+    query = """
+        WITH o AS (%s)
+        SELECT row_to_json(page)::text, page.created_at, page.id
+        FROM (
+            SELECT o.*, COALESCE(i.items, '[]') AS items
+            FROM o
+            LEFT JOIN (
+                SELECT x.order_id, json_agg(x ORDER BY x.category_name, x.product_name) AS items
+                FROM (
+                    SELECT poi.*, p.name as product_name, p.unit, pc.name as category_name
+                    FROM product_order_items poi
+                    JOIN products p ON poi.product_id = p.id
+                    JOIN product_categories pc ON p.category_id = pc.id
+                    WHERE poi.order_id IN (SELECT id FROM o)
+                ) x
+                GROUP BY x.order_id
+            ) i ON i.order_id = o.id
+        ) page
+        ORDER BY page.created_at DESC, page.id DESC
+    """ % query
+    
+    conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'orders')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    cur = conn.cursor()
+    
+    cur.execute(query, args)
+    orders, next_cursor = split_page(cur.fetchall(), limit, (1, 2))
+    
+    cur.close()
+    conn.close()
+    
+    return raw_json_response(200, {'orders': json_rows(orders), 'nextCursor': dumps(next_cursor)}, etag_headers(etag))
+
+def get_order_stats(event: dict) -> dict:
+    '''Количество заявок по статусам без загрузки самих заявок'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    
+    conn = get_db_connection()
+    
+    etag = get_etag(conn, params, 'orders')
+    if is_not_modified(event, etag):
+        conn.close()
+        return not_modified_response(etag)
+    
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    cur.execute("""
+        SELECT status, COUNT(*) AS count
+        FROM product_orders
+        WHERE restaurant_id = %s
+        GROUP BY status
     """, (restaurant_id,))
-    orders = cur.fetchall()
-    
-    for order in orders:
-        cur.execute("""
-            SELECT poi.*, p.name as product_name, p.unit, pc.name as category_name
-            FROM product_order_items poi
-            JOIN products p ON poi.product_id = p.id
-            JOIN product_categories pc ON p.category_id = pc.id
-            WHERE poi.order_id = %s
-            ORDER BY pc.name, p.name
-        """, (order['id'],))
-        order['items'] = [dict(item) for item in cur.fetchall()]
+    rows = cur.fetchall()
     
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'orders': [dict(o) for o in orders]}, default=str),
-        'isBase64Encoded': False
-    }
+    stats = {'pending': 0, 'ordered': 0, 'completed': 0}
+    for row in rows:
+        stats[row['status']] = row['count']
+    stats['total'] = sum(row['count'] for row in rows)
+    
+    return json_response(200, {'stats': stats}, etag_headers(etag))
 
-def create_category(body: dict) -> dict:
+def create_category(event: dict) -> dict:
     '''Создание категории продуктов'''
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     name = body.get('name')
     
@@ -175,46 +323,66 @@ def create_category(body: dict) -> dict:
     )
     category = cur.fetchone()
     
+    bump_versions(cur, restaurant_id, 'products')
+    
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'category': dict(category)}, default=str),
-        'isBase64Encoded': False
-    }
+    get_product_cache().invalidate(restaurant_id)
+    
+    return json_response(200, {'category': dict(category)})
+
+def parse_price(value):
+    '''Цена продукта из числа или строки «123,45»; None — цена не задана, ValueError — неверная цена'''
+    if value is None or str(value).strip() == '':
+        return None
+    try:
+        price = Decimal(str(value).strip().replace(',', '.'))
+    except InvalidOperation:
+        raise ValueError('Invalid price')
+    if not price.is_finite() or price < 0 or price >= 10 ** 10:
+        raise ValueError('Invalid price')
+    price = price.quantize(Decimal('0.01'))
+    if price >= 10 ** 10:
+        raise ValueError('Invalid price')
+    return price
 
-def create_product(body: dict) -> dict:
+def create_product(event: dict) -> dict:
     '''Создание продукта'''
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     category_id = body.get('categoryId')
     name = body.get('name')
     unit = body.get('unit')
     
+    try:
+        price = parse_price(body.get('price'))
+    except ValueError as e:
+        return json_response(400, {'error': str(e)})
+    
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=RealDictCursor)
     
     cur.execute(
-        "INSERT INTO products (restaurant_id, category_id, name, unit) VALUES (%s, %s, %s, %s) RETURNING *",
-        (restaurant_id, category_id, name, unit)
+        "INSERT INTO products (restaurant_id, category_id, name, unit, price) VALUES (%s, %s, %s, %s, %s) RETURNING *",
+        (restaurant_id, category_id, name, unit, price)
     )
     product = cur.fetchone()
     
+    bump_versions(cur, restaurant_id, 'products')
+    
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'product': dict(product)}, default=str),
-        'isBase64Encoded': False
-    }
+    get_product_cache().invalidate(restaurant_id)
+    
+    return json_response(200, {'product': dict(product)})
 
-def create_order(body: dict) -> dict:
+def create_order(event: dict) -> dict:
     '''Создание заявки на продукты'''
+    body = get_body(event)
     restaurant_id = body.get('restaurantId')
     created_by = body.get('createdBy')
     items = body.get('items', [])
@@ -229,25 +397,25 @@ def create_order(body: dict) -> dict:
     order = cur.fetchone()
     order_id = order['id']
     
-    for item in items:
-        cur.execute(
-            "INSERT INTO product_order_items (order_id, product_id, status, notes) VALUES (%s, %s, %s, %s)",
-            (order_id, item['productId'], item['status'], item.get('notes', ''))
+    if items:
+        execute_values(
+            cur,
+            "INSERT INTO product_order_items (order_id, product_id, status, notes) VALUES %s",
+            [(order_id, item['productId'], item['status'], item.get('notes', '')) for item in items],
+            page_size=len(items)
         )
     
+    bump_versions(cur, restaurant_id, 'orders', change={'action': 'create_order', 'orderId': order_id, 'status': 'pending'})
+    
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'order': dict(order)}, default=str),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'order': dict(order)})
 
-def update_order_item(body: dict) -> dict:
+def update_order_item(event: dict) -> dict:
     '''Обновление статуса позиции в заявке'''
+    body = get_body(event)
     item_id = body.get('itemId')
     status = body.get('status')
     notes = body.get('notes', '')
@@ -255,24 +423,25 @@ def update_order_item(body: dict) -> dict:
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute(
-        "UPDATE product_order_items SET status = %s, notes = %s WHERE id = %s",
-        (status, notes, item_id)
-    )
+    cur.execute("""
+        UPDATE product_order_items poi SET status = %s, notes = %s
+        FROM product_orders po
+        WHERE poi.id = %s AND po.id = poi.order_id
+        RETURNING po.restaurant_id
+    """, (status, notes, item_id))
+    order = cur.fetchone()
+    if order:
+        bump_versions(cur, order[0], 'orders')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
 
-def update_order_status(body: dict) -> dict:
+def update_order_status(event: dict) -> dict:
     '''Обновление статуса заявки'''
+    body = get_body(event)
     order_id = body.get('orderId')
     status = body.get('status')
     
@@ -280,64 +449,101 @@ def update_order_status(body: dict) -> dict:
     cur = conn.cursor()
     
     cur.execute(
-        "UPDATE product_orders SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+        "UPDATE product_orders SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING restaurant_id",
         (status, order_id)
     )
+    order = cur.fetchone()
+    if order:
+        bump_versions(cur, order[0], 'orders', change={'action': 'update_order_status', 'orderId': order_id, 'status': status})
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    return json_response(200, {'success': True})
 
-def delete_category(body: dict) -> dict:
+def delete_category(event: dict) -> dict:
     '''Удаление категории'''
+    body = get_body(event)
     category_id = body.get('categoryId')
     
     conn = get_db_connection()
     cur = conn.cursor()
     
     cur.execute("DELETE FROM products WHERE category_id = %s", (category_id,))
-    cur.execute("DELETE FROM product_categories WHERE id = %s", (category_id,))
+    cur.execute("DELETE FROM product_categories WHERE id = %s RETURNING restaurant_id", (category_id,))
+    category = cur.fetchone()
+    if category:
+        bump_versions(cur, category[0], 'products', 'orders')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    if category:
+        get_product_cache().invalidate(category[0])
+    
+    return json_response(200, {'success': True})
 
-def delete_product(body: dict) -> dict:
+def delete_product(event: dict) -> dict:
     '''Удаление продукта'''
+    body = get_body(event)
     product_id = body.get('productId')
     
     conn = get_db_connection()
     cur = conn.cursor()
     
-    cur.execute("DELETE FROM products WHERE id = %s", (product_id,))
+    cur.execute("DELETE FROM products WHERE id = %s RETURNING restaurant_id", (product_id,))
+    product = cur.fetchone()
+    if product:
+        bump_versions(cur, product[0], 'products')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    if product:
+        get_product_cache().invalidate(product[0])
+    
+    return json_response(200, {'success': True})
 
-def update_category(body: dict) -> dict:
+def update_product_price(event: dict) -> dict:
+    '''Изменение закупочной цены продукта'''
+    body = get_body(event)
+    product_id = body.get('productId')
+    
+    try:
+        price = parse_price(body.get('price'))
+    except ValueError as e:
+        return json_response(400, {'error': str(e)})
+    
+    conn = get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    
+    cur.execute(
+        "UPDATE products SET price = %s WHERE id = %s AND price IS DISTINCT FROM %s RETURNING id, restaurant_id, price",
+        (price, product_id, price)
+    )
+    product = cur.fetchone()
+    if product:
+        bump_versions(cur, product['restaurant_id'], 'products', change={
+            'action': 'update_product_price',
+            'productId': product['id'],
+            'price': product['price'],
+        })
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+    
+    if product:
+        get_product_cache().invalidate(product['restaurant_id'])
+    
+    return json_response(200, {'success': True})
+
+def update_category(event: dict) -> dict:
     '''Обновление названия категории'''
+    body = get_body(event)
     category_id = body.get('categoryId')
     name = body.get('name')
     
@@ -345,38 +551,199 @@ def update_category(body: dict) -> dict:
     cur = conn.cursor()
     
     cur.execute(
-        "UPDATE product_categories SET name = %s WHERE id = %s",
+        "UPDATE product_categories SET name = %s WHERE id = %s RETURNING restaurant_id",
         (name, category_id)
     )
+    category = cur.fetchone()
+    if category:
+        bump_versions(cur, category[0], 'products', 'orders')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
+    if category:
+        get_product_cache().invalidate(category[0])
+    
+    return json_response(200, {'success': True})
 
-def delete_order(body: dict) -> dict:
+def delete_order(event: dict) -> dict:
     '''Удаление заявки'''
+    body = get_body(event)
     order_id = body.get('orderId')
     
     conn = get_db_connection()
     cur = conn.cursor()
     
     cur.execute("DELETE FROM product_order_items WHERE order_id = %s", (order_id,))
-    cur.execute("DELETE FROM product_orders WHERE id = %s", (order_id,))
+    cur.execute("DELETE FROM product_orders WHERE id = %s RETURNING restaurant_id", (order_id,))
+    order = cur.fetchone()
+    if order:
+        bump_versions(cur, order[0], 'orders')
     
     conn.commit()
     cur.close()
     conn.close()
     
-    return {
-        'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True}),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    return json_response(200, {'success': True})
+
+def export_orders(event: dict) -> dict:
+    '''Выгрузка позиций заявок за период в CSV или JSON Lines (format, gzip, from, to)'''
+    params = event.get('queryStringParameters', {})
+    restaurant_id = params.get('restaurantId')
+    
+    try:
+        export_format, compress, date_from, date_to = get_export_params(params)
+    except ValueError:
+        return json_response(400, {'error': 'Invalid export parameters'})
+    
+    query = """
+        SELECT po.id, po.created_at, po.status, e.name, pc.name, p.name, p.unit, poi.status, poi.notes
+        FROM product_orders po
+        JOIN employees e ON po.created_by = e.id
+        JOIN product_order_items poi ON poi.order_id = po.id
+        JOIN products p ON poi.product_id = p.id
+        JOIN product_categories pc ON p.category_id = pc.id
+        WHERE po.restaurant_id = %s
+    """
+    args = [restaurant_id]
+    if date_from:
+        query += " AND po.created_at >= %s"
+        args.append(date_from)
+    if date_to:
+        query += " AND po.created_at < %s::date + 1"
+        args.append(date_to)
+    query += " ORDER BY po.created_at, po.id, pc.name, p.name"
+    
+    columns = ['order_id', 'created_at', 'order_status', 'created_by', 'category', 'product', 'unit', 'item_status', 'notes']
+    
+    conn = get_db_connection()
+    cur = conn.cursor('export_orders')
+    cur.execute(query, args)
+    
+    response = export_response(iter_export_chunks(cur, columns, export_format), export_format, compress, 'orders')
+    
+    cur.close()
+    conn.close()
+    
+    return response
+
+def import_products(event: dict) -> dict:
+    '''Массовый импорт продуктов из CSV или JSON: COPY во временную таблицу и upsert с созданием категорий'''
+    body = get_body(event)
+    restaurant_id = body.get('restaurantId')
+    
+    if not restaurant_id:
+        return json_response(400, {'error': 'Missing required fields'})
+    
+    try:
+        rows = read_import_rows(body, ('category', 'name', 'unit'))
+    except ValueError as e:
+        return json_response(400, {'error': str(e)})
+    
+    valid = []
+    errors = []
+    seen = {}
+    for row_no, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({'row': row_no, 'error': 'Row must be an object'})
+            continue
+        category = str(row.get('category') or '').strip()
+        name = str(row.get('name') or '').strip()
+        unit = str(row.get('unit') or '').strip()
+        try:
+            price = parse_price(row.get('price'))
+        except ValueError as e:
+            errors.append({'row': row_no, 'error': str(e)})
+            continue
+        if not (category and name and unit):
+            error = 'Missing category, name or unit'
+        elif len(category) > 100 or len(name) > 255 or len(unit) > 50:
+            error = 'Value too long'
+        elif (category, name) in seen:
+            error = 'Duplicate of row %d' % seen[(category, name)]
+        else:
+            seen[(category, name)] = row_no
+            valid.append((row_no, category, name, unit, price))
+            continue
+        errors.append({'row': row_no, 'error': error})
+    
+    conn = get_db_connection()
+    cur = conn.cursor()
+    
+    cur.execute("""
+        CREATE TEMP TABLE product_import (
+            row_no INTEGER, category VARCHAR(100), name VARCHAR(255), unit VARCHAR(50), price DECIMAL(12, 2)
+        ) ON COMMIT DROP
+    """)
+    copy_rows(cur, 'product_import', ('row_no', 'category', 'name', 'unit', 'price'), valid)
+    cur.execute("ANALYZE product_import")
+    
+    cur.execute("""
+        INSERT INTO product_categories (restaurant_id, name)
+        SELECT DISTINCT %s, i.category FROM product_import i
+        WHERE NOT EXISTS (SELECT 1 FROM product_categories c WHERE c.restaurant_id = %s AND c.name = i.category)
+    """, (restaurant_id, restaurant_id))
+    categories_created = cur.rowcount
+    
+    cur.execute("""
+        CREATE TEMP TABLE product_import_matched ON COMMIT DROP AS
+        SELECT i.name, i.unit, i.price, c.id AS category_id, p.id AS product_id,
+               p.unit AS current_unit, p.price AS current_price
+        FROM product_import i
+        JOIN (SELECT name, min(id) AS id FROM product_categories WHERE restaurant_id = %s GROUP BY name) c ON c.name = i.category
+        LEFT JOIN products p ON p.restaurant_id = %s AND p.category_id = c.id AND p.name = i.name
+    """, (restaurant_id, restaurant_id))
+    
+    cur.execute("""
+        UPDATE products p SET unit = m.unit, price = COALESCE(m.price, p.price)
+        FROM product_import_matched m
+        WHERE p.id = m.product_id
+          AND (m.unit <> m.current_unit OR (m.price IS NOT NULL AND m.price IS DISTINCT FROM m.current_price))
+    """)
+    updated = cur.rowcount
+    
+    cur.execute("""
+        INSERT INTO products (restaurant_id, category_id, name, unit, price)
+        SELECT %s, category_id, name, unit, price
+        FROM product_import_matched WHERE product_id IS NULL
+    """, (restaurant_id,))
+    inserted = cur.rowcount
+    
+    if inserted or updated or categories_created:
+        bump_versions(cur, restaurant_id, 'products')
+    
+    conn.commit()
+    cur.close()
+    conn.close()
+    
+    get_product_cache().invalidate(restaurant_id)
+    
+    return json_response(200, {
+        'imported': {
+            'inserted': inserted,
+            'updated': updated,
+            'unchanged': len(valid) - inserted - updated,
+            'categoriesCreated': categories_created,
+        },
+        'errors': errors,
+    })
+
+ROUTES = {
+    ('GET', 'get_categories'): get_categories,
+    ('GET', 'get_products'): get_products,
+    ('GET', 'get_orders'): get_orders,
+    ('GET', 'get_order_stats'): get_order_stats,
+    ('GET', 'export_orders'): export_orders,
+    ('POST', 'create_category'): create_category,
+    ('POST', 'create_product'): create_product,
+    ('POST', 'create_order'): create_order,
+    ('POST', 'update_order_item'): update_order_item,
+    ('POST', 'update_order_status'): update_order_status,
+    ('POST', 'delete_category'): delete_category,
+    ('POST', 'delete_product'): delete_product,
+    ('POST', 'update_product_price'): update_product_price,
+    ('POST', 'update_category'): update_category,
+    ('POST', 'delete_order'): delete_order,
+    ('POST', 'import_products'): import_products,
+}
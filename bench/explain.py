@@ -0,0 +1,119 @@
+'''EXPLAIN (ANALYZE, BUFFERS) для каждого запроса обработчиков с пометкой последовательных сканирований'''
+
+import argparse
+import os
+import sys
+
+import psycopg2
+import psycopg2.extensions
+
+import run
+
+_captured = []
+_capturing_cursors = {}
+
+def capturing_cursor(factory):
+    '''Подкласс курсора, запоминающий каждый выполненный запрос с подставленными параметрами'''
+    if factory not in _capturing_cursors:
+        class CapturingCursor(factory):
+            def execute(self, query, vars=None):
+                _captured.append(self.mogrify(query, vars).decode('utf-8'))
+                return super().execute(query, vars)
+
+        _capturing_cursors[factory] = CapturingCursor
+    return _capturing_cursors[factory]
+
+class CapturingConnection(psycopg2.extensions.connection):
+    '''Соединение, все курсоры которого запоминают запросы'''
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=capturing_cursor(factory), **kwargs)
+
+def install_capture() -> None:
+    '''Подменить фабрику соединений, через которую пул обработчиков открывает соединения'''
+    connect = psycopg2.connect
+
+    def capturing_connect(*args, **kwargs):
+        kwargs.setdefault('connection_factory', CapturingConnection)
+        return connect(*args, **kwargs)
+
+    psycopg2.connect = capturing_connect
+
+def walk(plan: dict):
+    '''Все узлы плана, включая подпланы'''
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from walk(child)
+
+def explain(cur, statement: str) -> dict:
+    '''План запроса; изменения данных откатываются'''
+    cur.execute('SAVEPOINT explain')
+    try:
+        cur.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + statement)
+        return cur.fetchone()[0][0]
+    finally:
+        cur.execute('ROLLBACK TO SAVEPOINT explain')
+
+def summarize(statement: str, width: int = 100) -> str:
+    '''Запрос в одну строку для отчёта'''
+    return ' '.join(statement.split())[:width]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Планы запросов обработчиков на засеянной базе')
+    parser.add_argument('--dsn', default=os.environ.get('BENCH_DATABASE_URL', run.DEFAULT_DSN))
+    parser.add_argument('--only', help='подстрока имени сценария')
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help='последовательное сканирование таблиц меньше этого размера не помечается')
+    parser.add_argument('--verbose', action='store_true', help='печатать все запросы, а не только проблемные')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.dsn
+    fixtures = run.load_fixtures(args.dsn)
+    install_capture()
+
+    conn = psycopg2.connect(args.dsn, connection_factory=psycopg2.extensions.connection)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT relname, reltuples::bigint FROM pg_class
+        WHERE relkind = 'r' AND relnamespace = current_schema()::regnamespace
+    """)
+    table_rows = dict(cur.fetchall())
+
+    handlers = {}
+    flagged = 0
+    for name, function, method, params, body in run.get_scenarios(fixtures):
+        if args.only and args.only not in name:
+            continue
+        if function not in handlers:
+            handlers[function] = run.load_handler(function)
+        del _captured[:]
+        handlers[function](run.make_event(method, params, body), None)
+
+        print('== %s (%d statements)' % (name, len(_captured)))
+        for statement in _captured:
+            if statement.strip().upper() in ('SELECT 1', 'BEGIN', 'COMMIT', 'ROLLBACK'):
+                continue
+            plan = explain(cur, statement)
+            scans = [
+                '%s (%d rows)' % (node['Relation Name'], table_rows.get(node['Relation Name'], 0))
+                for node in walk(plan['Plan'])
+                if node['Node Type'] == 'Seq Scan' and table_rows.get(node['Relation Name'], 0) >= args.min_rows
+            ]
+            flagged += len(scans)
+            if scans or args.verbose:
+                print('  %8.2f ms  hit=%-6d read=%-6d %s' % (
+                    plan['Execution Time'],
+                    plan['Plan'].get('Shared Hit Blocks', 0),
+                    plan['Plan'].get('Shared Read Blocks', 0),
+                    summarize(statement)))
+            for scan in scans:
+                print('      SEQ SCAN %s' % scan)
+        conn.rollback()
+
+    conn.close()
+    print('%d sequential scans on tables with >= %d rows' % (flagged, args.min_rows))
+    return 1 if flagged else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+-- Составные индексы под keyset-пагинацию списков
+
+CREATE INDEX IF NOT EXISTS idx_ttk_restaurant_created ON t_p93487342_chefassist_kitchen_m.ttk(restaurant_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_checklists_restaurant_created ON t_p93487342_chefassist_kitchen_m.checklists(restaurant_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_employees_restaurant_joined ON t_p93487342_chefassist_kitchen_m.employees(restaurant_id, joined_at, id);
+CREATE INDEX IF NOT EXISTS idx_products_category_name ON t_p93487342_chefassist_kitchen_m.products(category_id, name, id);
+CREATE INDEX IF NOT EXISTS idx_product_orders_restaurant_created ON t_p93487342_chefassist_kitchen_m.product_orders(restaurant_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_inventories_restaurant_completed ON t_p93487342_chefassist_kitchen_m.inventories(restaurant_id, status, completed_at, id);
@@ -0,0 +1,7 @@
+-- Версии ресурсов ресторана для ETag и условных GET-запросов
+CREATE TABLE IF NOT EXISTS t_p93487342_chefassist_kitchen_m.resource_versions (
+    restaurant_id INTEGER NOT NULL REFERENCES t_p93487342_chefassist_kitchen_m.restaurants(id),
+    resource VARCHAR(50) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (restaurant_id, resource)
+);
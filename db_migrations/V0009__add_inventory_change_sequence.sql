@@ -0,0 +1,11 @@
+-- Последовательность изменений инвентаризации для дельта-синхронизации
+ALTER TABLE t_p93487342_chefassist_kitchen_m.inventories
+ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE t_p93487342_chefassist_kitchen_m.inventory_products
+ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE t_p93487342_chefassist_kitchen_m.inventory_entries
+ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_inventory_entries_change_seq ON t_p93487342_chefassist_kitchen_m.inventory_entries(inventory_product_id, change_seq);
@@ -0,0 +1,22 @@
+-- Итоги по продуктам завершённых инвентаризаций
+CREATE TABLE IF NOT EXISTS t_p93487342_chefassist_kitchen_m.inventory_totals (
+    inventory_product_id INTEGER PRIMARY KEY REFERENCES t_p93487342_chefassist_kitchen_m.inventory_products(id),
+    inventory_id INTEGER NOT NULL REFERENCES t_p93487342_chefassist_kitchen_m.inventories(id),
+    total_quantity DECIMAL(12, 3) NOT NULL DEFAULT 0,
+    entries_count INTEGER NOT NULL DEFAULT 0,
+    contributors TEXT[] NOT NULL DEFAULT '{}',
+    last_entry_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_totals_inventory ON t_p93487342_chefassist_kitchen_m.inventory_totals(inventory_id);
+
+-- Итоги для уже завершённых инвентаризаций
+INSERT INTO t_p93487342_chefassist_kitchen_m.inventory_totals
+    (inventory_product_id, inventory_id, total_quantity, entries_count, contributors, last_entry_at)
+SELECT ip.id, ip.inventory_id, SUM(e.quantity), COUNT(*), array_agg(DISTINCT e.user_name), MAX(e.created_at)
+FROM t_p93487342_chefassist_kitchen_m.inventory_products ip
+JOIN t_p93487342_chefassist_kitchen_m.inventories i ON i.id = ip.inventory_id
+JOIN t_p93487342_chefassist_kitchen_m.inventory_entries e ON e.inventory_product_id = ip.id
+WHERE i.status = 'completed'
+GROUP BY ip.id, ip.inventory_id
+ON CONFLICT (inventory_product_id) DO NOTHING;
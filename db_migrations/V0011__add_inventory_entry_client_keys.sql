@@ -0,0 +1,5 @@
+-- Ключ идемпотентности записи, генерируемый клиентом при офлайн-подсчёте
+ALTER TABLE t_p93487342_chefassist_kitchen_m.inventory_entries
+ADD COLUMN IF NOT EXISTS client_key VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_inventory_entries_client_key ON t_p93487342_chefassist_kitchen_m.inventory_entries(client_key);
@@ -0,0 +1,6 @@
+-- Онлайн-статус вычисляется по last_seen, индекс по is_online не используется,
+-- а каждый heartbeat его обновлял
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_employees_online;
+
+-- Запас места на странице для HOT-обновлений last_seen
+ALTER TABLE t_p93487342_chefassist_kitchen_m.employees SET (fillfactor = 80);
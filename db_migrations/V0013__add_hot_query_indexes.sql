@@ -0,0 +1,32 @@
+-- Индексы под горячие запросы обработчиков (проверено bench/explain.py)
+
+-- Вход и присоединение: поиск сотрудника по имени в ресторане
+CREATE INDEX IF NOT EXISTS idx_employees_restaurant_name ON t_p93487342_chefassist_kitchen_m.employees(restaurant_id, name);
+
+-- get_categories и get_products
+CREATE INDEX IF NOT EXISTS idx_product_categories_restaurant_name ON t_p93487342_chefassist_kitchen_m.product_categories(restaurant_id, name);
+CREATE INDEX IF NOT EXISTS idx_products_restaurant_category_name ON t_p93487342_chefassist_kitchen_m.products(restaurant_id, category_id, name, id);
+
+-- Позиции заявок: загрузка по заявке и проверка внешнего ключа при удалении продукта
+CREATE INDEX IF NOT EXISTS idx_product_order_items_order ON t_p93487342_chefassist_kitchen_m.product_order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_product_order_items_product ON t_p93487342_chefassist_kitchen_m.product_order_items(product_id);
+
+-- Проверка внешнего ключа при удалении сотрудника
+CREATE INDEX IF NOT EXISTS idx_product_orders_created_by ON t_p93487342_chefassist_kitchen_m.product_orders(created_by);
+
+-- Пункты чек-листа в порядке отображения
+CREATE INDEX IF NOT EXISTS idx_checklist_items_checklist_order ON t_p93487342_chefassist_kitchen_m.checklist_items(checklist_id, item_order);
+
+-- Активная инвентаризация ресторана: частичный индекс только по незавершённым
+CREATE INDEX IF NOT EXISTS idx_inventories_active ON t_p93487342_chefassist_kitchen_m.inventories(restaurant_id, created_at DESC)
+WHERE status = 'in_progress';
+
+-- Индексы, полностью покрытые более широкими составными (лишняя цена на запись)
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_employees_restaurant;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_employees_email;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_restaurants_invite_code;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_ttk_restaurant;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_checklists_restaurant;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_checklist_items_checklist;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_inventories_restaurant;
+DROP INDEX IF EXISTS t_p93487342_chefassist_kitchen_m.idx_inventory_entries_product;
@@ -0,0 +1,62 @@
+-- Состав ТТК построчно: поиск блюд по продукту и пересчёт рецептур без разбора текста ttk.ingredients
+CREATE TABLE IF NOT EXISTS t_p93487342_chefassist_kitchen_m.ttk_ingredients (
+    id SERIAL PRIMARY KEY,
+    ttk_id INTEGER NOT NULL REFERENCES t_p93487342_chefassist_kitchen_m.ttk(id),
+    restaurant_id INTEGER NOT NULL REFERENCES t_p93487342_chefassist_kitchen_m.restaurants(id),
+    position INTEGER NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    -- Удаление продукта из матрицы не должно блокироваться ТТК, где он упомянут
+    product_id INTEGER REFERENCES t_p93487342_chefassist_kitchen_m.products(id) ON DELETE SET NULL,
+    gross DECIMAL(12, 3),
+    net DECIMAL(12, 3),
+    unit VARCHAR(50)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ttk_ingredients_ttk ON t_p93487342_chefassist_kitchen_m.ttk_ingredients(ttk_id, position);
+CREATE INDEX IF NOT EXISTS idx_ttk_ingredients_product ON t_p93487342_chefassist_kitchen_m.ttk_ingredients(product_id) WHERE product_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_ttk_ingredients_restaurant_name ON t_p93487342_chefassist_kitchen_m.ttk_ingredients(restaurant_id, lower(name));
+
+-- Разбор существующих ТТК теми же правилами, что parse_ingredients в backend/data:
+-- «Наименование - Брутто - Нетто», «Наименование - Нетто» или «Наименование 100/80 г»
+INSERT INTO t_p93487342_chefassist_kitchen_m.ttk_ingredients (ttk_id, restaurant_id, position, name, product_id, gross, net, unit)
+WITH lines AS (
+    SELECT t.id AS ttk_id, t.restaurant_id, l.n, regexp_replace(l.line, '^\s+|\s+$', '', 'g') AS line
+    FROM t_p93487342_chefassist_kitchen_m.ttk t
+    CROSS JOIN LATERAL regexp_split_to_table(t.ingredients, E'\r?\n|\r') WITH ORDINALITY AS l(line, n)
+), split AS (
+    SELECT ttk_id, restaurant_id, row_number() OVER (PARTITION BY ttk_id ORDER BY n) AS position, line,
+           regexp_split_to_array(line, '\s+[-–—]\s+') AS parts,
+           regexp_match(line, '^(.*\S)\s+(\d+(?:[.,]\d+)?)\s*/\s*(\d+(?:[.,]\d+)?)\s*(.*)$') AS slash
+    FROM lines
+    WHERE line <> ''
+), fields AS (
+    SELECT ttk_id, restaurant_id, position,
+           CASE
+               WHEN cardinality(parts) = 1 AND slash IS NOT NULL THEN slash[1]
+               WHEN cardinality(parts) >= 2 THEN parts[1]
+               ELSE line
+           END AS name,
+           CASE
+               WHEN cardinality(parts) = 1 AND slash IS NOT NULL THEN slash[2] || slash[4]
+               WHEN cardinality(parts) >= 2 THEN parts[2]
+           END AS gross_text,
+           CASE
+               WHEN cardinality(parts) = 1 AND slash IS NOT NULL THEN slash[3] || slash[4]
+               WHEN cardinality(parts) >= 3 THEN parts[3]
+               WHEN cardinality(parts) = 2 THEN parts[2]
+           END AS net_text
+    FROM split
+), quantities AS (
+    SELECT ttk_id, restaurant_id, position, left(regexp_replace(name, '^\s+|\s+$', '', 'g'), 255) AS name,
+           regexp_match(regexp_replace(gross_text, '^\s+|\s+$', '', 'g'), '^(\d+(?:[.,]\d+)?)\s*(.*)$') AS g,
+           regexp_match(regexp_replace(net_text, '^\s+|\s+$', '', 'g'), '^(\d+(?:[.,]\d+)?)\s*(.*)$') AS q
+    FROM fields
+)
+SELECT ttk_id, restaurant_id, position, name,
+       (SELECT min(p.id) FROM t_p93487342_chefassist_kitchen_m.products p
+        WHERE p.restaurant_id = quantities.restaurant_id AND lower(p.name) = lower(quantities.name)),
+       CASE WHEN g[1] ~ '^\d{1,9}([.,]\d+)?$' THEN replace(g[1], ',', '.')::numeric END,
+       CASE WHEN q[1] ~ '^\d{1,9}([.,]\d+)?$' THEN replace(q[1], ',', '.')::numeric END,
+       left(COALESCE(NULLIF(lower(btrim(q[2], ' .')), ''), NULLIF(lower(btrim(g[2], ' .')), '')), 50)
+FROM quantities
+ORDER BY ttk_id, position;
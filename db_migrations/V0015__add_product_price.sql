@@ -0,0 +1,2 @@
+-- Закупочная цена продукта за единицу из products.unit (кг, л, шт) для расчёта себестоимости ТТК
+ALTER TABLE t_p93487342_chefassist_kitchen_m.products ADD COLUMN IF NOT EXISTS price DECIMAL(12, 2);
@@ -0,0 +1,424 @@
+'''ASGI-приложение для самостоятельного развёртывания: все функции backend в одном процессе с общим пулом соединений'''
+
+import asyncio
+import base64
+import importlib.util
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qsl
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+ROOT = Path(__file__).resolve().parent.parent
+FUNCTIONS = ('auth', 'data', 'inventory', 'products')
+
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '16'))
+SERVER_MAX_PENDING = int(os.environ.get('SERVER_MAX_PENDING', '1000'))
+SERVER_MAX_BODY = int(os.environ.get('SERVER_MAX_BODY', str(10 * 1024 * 1024)))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
+CHANGES_CHANNEL = 'chefassist_changes'
+SSE_KEEPALIVE = float(os.environ.get('SSE_KEEPALIVE', '15'))
+SSE_QUEUE_SIZE = int(os.environ.get('SSE_QUEUE_SIZE', '100'))
+LISTEN_RETRY = float(os.environ.get('LISTEN_RETRY', '5'))
+RESYNC = json.dumps({'resync': True})
+
+BOOTSTRAP_SECTIONS = {
+    'restaurant': ('auth', 'GET', 'get_restaurant'),
+    'employees': ('auth', 'POST', 'get_employees'),
+    'ttk': ('data', 'GET', 'get_ttk'),
+    'checklists': ('data', 'GET', 'get_checklists'),
+    'categories': ('products', 'GET', 'get_categories'),
+    'products': ('products', 'GET', 'get_products'),
+    'orders': ('products', 'GET', 'get_orders'),
+    'activeInventory': ('inventory', 'GET', 'get_active_inventory'),
+}
+
+_current = threading.local()
+
+class ServerConnection(psycopg2.extensions.connection):
+    '''Соединение общего пула: курсоры пишут метрики в common.py функции, обрабатывающей запрос'''
+
+    def cursor(self, *args, **kwargs):
+        common = getattr(_current, 'common', None)
+        if common is None or not common.REQUEST_METRICS:
+            return super().cursor(*args, **kwargs)
+        factory = kwargs.pop('cursor_factory', None) or self.cursor_factory or psycopg2.extensions.cursor
+        return super().cursor(*args, cursor_factory=common.instrumented_cursor(factory), **kwargs)
+
+class SharedConnectionPool(ThreadedConnectionPool):
+    '''Пул на весь процесс: при исчерпании поток ждёт освободившееся соединение, а не получает ошибку'''
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # psycopg2 закрывает возвращённые соединения сверх minconn; открываем лениво, но храним до maxconn
+        self.minconn = maxconn
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise PoolError('connection pool exhausted')
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+class ChangeListener:
+    '''Одно соединение LISTEN на процесс: уведомления bump_versions раздаются подписчикам своего ресторана'''
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.subscribers = {}
+
+    def subscribe(self, restaurant_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(SSE_QUEUE_SIZE)
+        self.subscribers.setdefault(restaurant_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, restaurant_id: str, queue: asyncio.Queue) -> None:
+        queues = self.subscribers.get(restaurant_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[restaurant_id]
+
+    def deliver(self, queue: asyncio.Queue, payload: str) -> None:
+        '''Отстающему клиенту вместо накопленных событий отправляется одно resync'''
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            restaurant_id = str(json.loads(payload)['restaurantId'])
+        except (ValueError, KeyError, TypeError):
+            return
+        for queue in list(self.subscribers.get(restaurant_id, ())):
+            self.deliver(queue, payload)
+
+    def connect(self):
+        conn = psycopg2.connect(self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        conn.autocommit = True
+        cur = conn.cursor()
+        cur.execute('LISTEN %s' % CHANGES_CHANNEL)
+        cur.close()
+        return conn
+
+    async def run(self) -> None:
+        '''Слушать канал, переподключаясь при обрыве; после переподключения все клиенты получают resync'''
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                conn = await loop.run_in_executor(None, self.connect)
+            except psycopg2.Error:
+                await asyncio.sleep(LISTEN_RETRY)
+                continue
+            for queues in list(self.subscribers.values()):
+                for queue in list(queues):
+                    self.deliver(queue, RESYNC)
+            readable = asyncio.Event()
+            loop.add_reader(conn.fileno(), readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    conn.poll()
+                    while conn.notifies:
+                        self.dispatch(conn.notifies.pop(0).payload)
+            except psycopg2.Error:
+                pass
+            finally:
+                loop.remove_reader(conn.fileno())
+                conn.close()
+            await asyncio.sleep(LISTEN_RETRY)
+
+def load_module(name: str, path: Path):
+    '''Загрузить файл отдельным модулем'''
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_function(name: str):
+    '''Загрузить backend/<name>/index.py со своей копией common.py, как это делает платформа'''
+    common = load_module('backend_%s_common' % name, ROOT / 'backend' / name / 'common.py')
+    sys.modules['common'] = common
+    try:
+        module = load_module('backend_%s' % name, ROOT / 'backend' / name / 'index.py')
+    finally:
+        del sys.modules['common']
+    module.common = common
+    return module
+
+def create_pool(modules: dict) -> SharedConnectionPool:
+    '''Один пул на все функции: размер равен числу потоков, поэтому поток не остаётся без соединения'''
+    dsn = os.environ.get('DATABASE_URL')
+    if not dsn:
+        raise Exception('DATABASE_URL not configured')
+    pool = SharedConnectionPool(1, SERVER_THREADS, dsn, connection_factory=ServerConnection)
+    for module in modules.values():
+        module.common._pool = pool
+        module.common.DB_POOL_MAX_SIZE = SERVER_THREADS
+    return pool
+
+def make_event(scope: dict, body: bytes) -> dict:
+    '''Событие в формате облачной функции из HTTP-запроса ASGI'''
+    headers = {}
+    for key, value in scope['headers']:
+        headers[key.decode('latin-1')] = value.decode('latin-1')
+    return {
+        'httpMethod': scope['method'],
+        'path': scope['path'],
+        'queryStringParameters': dict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True)),
+        'headers': headers,
+        'body': body.decode('utf-8', errors='replace'),
+        'isBase64Encoded': False,
+    }
+
+def make_section_event(method: str, action: str, restaurant_id: str, limit: str = None) -> dict:
+    '''Событие для одного раздела bootstrap: restaurantId и limit в query или в теле POST'''
+    params = {'restaurantId': restaurant_id}
+    if limit:
+        params['limit'] = limit
+    return {
+        'httpMethod': method,
+        'queryStringParameters': {'action': action, **params} if method == 'GET' else {'action': action},
+        'headers': {},
+        'body': json.dumps(params) if method == 'POST' else '',
+        'isBase64Encoded': False,
+    }
+
+def section_json(response: dict) -> str:
+    '''Тело ответа обработчика как есть; при ошибке — {"status", "error"}'''
+    if response['statusCode'] == 200 and not response.get('isBase64Encoded'):
+        return response['body']
+    try:
+        error = json.loads(response['body'])['error']
+    except (ValueError, KeyError, TypeError):
+        error = 'Section failed'
+    return json.dumps({'status': response['statusCode'], 'error': error})
+
+def call_handler(module, event: dict) -> dict:
+    '''Вызов обработчика функции в рабочем потоке'''
+    _current.common = module.common
+    try:
+        return module.handler(event, None)
+    finally:
+        _current.common = None
+
+def error_response(status: int, message: str) -> dict:
+    '''Ответ сервера, не дошедший до обработчика функции'''
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': '{"error": "%s"}' % message,
+        'isBase64Encoded': False,
+    }
+
+async def read_body(receive) -> bytes:
+    '''Тело запроса целиком; None, если оно больше SERVER_MAX_BODY'''
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > SERVER_MAX_BODY:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+async def wait_disconnect(receive) -> None:
+    '''Дождаться закрытия соединения клиентом'''
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def send_response(send, response: dict) -> None:
+    '''Ответ облачной функции (statusCode, headers, body, isBase64Encoded) в сообщения ASGI'''
+    body = response.get('body') or ''
+    if response.get('isBase64Encoded'):
+        body = base64.b64decode(body)
+    elif isinstance(body, str):
+        body = body.encode('utf-8')
+    headers = [
+        (key.lower().encode('latin-1'), str(value).encode('latin-1'))
+        for key, value in (response.get('headers') or {}).items()
+    ]
+    await send({'type': 'http.response.start', 'status': response['statusCode'], 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+class Server:
+    '''Маршрутизация /<функция>?action=... на обработчики backend через ограниченный пул потоков, /events и /bootstrap'''
+
+    def __init__(self):
+        self.modules = {}
+        self.pool = None
+        self.executor = None
+        self.listener = None
+        self.listener_task = None
+        self.pending = 0
+
+    def start(self) -> None:
+        self.modules = {name: load_function(name) for name in FUNCTIONS}
+        self.pool = create_pool(self.modules)
+        self.executor = ThreadPoolExecutor(max_workers=SERVER_THREADS, thread_name_prefix='handler')
+        self.listener = ChangeListener(os.environ['DATABASE_URL'])
+        self.listener_task = asyncio.get_running_loop().create_task(self.listener.run())
+
+    def stop(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+        if self.pool is not None and not self.pool.closed:
+            self.pool.closeall()
+
+    async def lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self.start()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.listener_task is not None:
+                    self.listener_task.cancel()
+                await asyncio.get_running_loop().run_in_executor(None, self.stop)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def stream_events(self, scope, receive, send) -> None:
+        '''SSE-поток изменений ресторана: event: change с версиями ресурсов и сведениями о записи'''
+        params = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        restaurant_id = params.get('restaurantId', '')
+        if not restaurant_id.isdigit():
+            await send_response(send, error_response(400, 'Missing restaurantId'))
+            return
+
+        queue = self.listener.subscribe(restaurant_id)
+        disconnect = asyncio.ensure_future(wait_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'access-control-allow-origin', b'*'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while not disconnect.done():
+                get = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({get, disconnect}, timeout=SSE_KEEPALIVE, return_when=asyncio.FIRST_COMPLETED)
+                if get in done:
+                    chunk = ('event: change\ndata: %s\n\n' % get.result()).encode('utf-8')
+                else:
+                    get.cancel()
+                    chunk = b': ping\n\n'
+                if not disconnect.done():
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            self.listener.unsubscribe(restaurant_id, queue)
+            disconnect.cancel()
+
+    async def bootstrap(self, scope, send) -> None:
+        '''Разделы стартового экрана одним ответом: чтения идут параллельно на соединениях общего пула'''
+        params = dict(parse_qsl(scope['query_string'].decode('latin-1')))
+        restaurant_id = params.get('restaurantId', '')
+        if not restaurant_id.isdigit():
+            await send_response(send, error_response(400, 'Missing restaurantId'))
+            return
+        limit = params.get('limit')
+        if limit is not None and not limit.isdigit():
+            await send_response(send, error_response(400, 'Invalid limit'))
+            return
+        fields = [field for field in params.get('fields', '').split(',') if field] or list(BOOTSTRAP_SECTIONS)
+        if any(field not in BOOTSTRAP_SECTIONS for field in fields):
+            await send_response(send, error_response(400, 'Unknown field'))
+            return
+        if self.pending + len(fields) > SERVER_MAX_PENDING:
+            response = error_response(503, 'Server busy')
+            response['headers']['Retry-After'] = '1'
+            await send_response(send, response)
+            return
+
+        loop = asyncio.get_running_loop()
+        calls = []
+        for field in fields:
+            function, method, action = BOOTSTRAP_SECTIONS[field]
+            event = make_section_event(method, action, restaurant_id, limit)
+            calls.append(loop.run_in_executor(self.executor, call_handler, self.modules[function], event))
+        self.pending += len(fields)
+        try:
+            responses = await asyncio.gather(*calls)
+        finally:
+            self.pending -= len(fields)
+
+        body = '{%s}' % ','.join(
+            '"%s":%s' % (field, section_json(response)) for field, response in zip(fields, responses)
+        )
+        await send_response(send, {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', 'Cache-Control': 'no-store'},
+            'body': body,
+            'isBase64Encoded': False,
+        })
+
+    async def handle(self, scope, receive, send) -> None:
+        if scope['path'].strip('/') == 'events':
+            await self.stream_events(scope, receive, send)
+            return
+        if scope['path'].strip('/') == 'bootstrap':
+            await self.bootstrap(scope, send)
+            return
+        module = self.modules.get(scope['path'].strip('/'))
+        if module is None:
+            await send_response(send, error_response(404, 'Not found'))
+            return
+        if self.pending >= SERVER_MAX_PENDING:
+            response = error_response(503, 'Server busy')
+            response['headers']['Retry-After'] = '1'
+            await send_response(send, response)
+            return
+
+        body = await read_body(receive)
+        if body is None:
+            await send_response(send, error_response(413, 'Request body too large'))
+            return
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(self.executor, call_handler, module, make_event(scope, body))
+        finally:
+            self.pending -= 1
+        await send_response(send, response)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if self.executor is None:
+                self.start()
+            await self.handle(scope, receive, send)
+
+app = Server()
@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, ReactNode, useEffect } from 'react';
+import React, { createContext, useContext, useState, ReactNode, useEffect, useRef } from 'react';
 
 type UserRole = 'chef' | 'sous_chef' | 'cook';
 
@@ -62,6 +62,7 @@ export const AuthProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
 
   const [restaurant, setRestaurant] = useState<Restaurant | null>(null);
   const [employees, setEmployees] = useState<Employee[]>([]);
+  const employeesEtag = useRef<string | null>(null);
 
   useEffect(() => {
     if (user) {
@@ -250,14 +251,19 @@ export const AuthProvider: React.FC<{ children: ReactNode }> = ({ children }) =>
     if (!user?.restaurantId) return;
     
     try {
+      const headers: Record<string, string> = { 'Content-Type': 'application/json' };
+      if (employeesEtag.current) {
+        headers['If-None-Match'] = employeesEtag.current;
+      }
       const response = await fetch(`${API_URL}?action=get_employees`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers,
         body: JSON.stringify({ restaurantId: user.restaurantId })
       });
 
       if (response.ok) {
         const data = await response.json();
+        employeesEtag.current = response.headers.get('ETag');
         setEmployees(data.employees);
       }
     } catch (error) {
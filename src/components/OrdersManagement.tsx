@@ -8,6 +8,9 @@ import {
   DialogHeader,
   DialogTitle,
 } from '@/components/ui/dialog';
+import { useLiveUpdates } from '@/hooks/useLiveUpdates';
+
+const PRODUCTS_API_URL = 'https://functions.poehali.dev/2ff9cc4a-f745-42e6-bca2-f02bd90f39fd';
 
 interface OrdersManagementProps {
   restaurantId?: number;
@@ -18,31 +21,43 @@ export const useOrdersManagement = (restaurantId?: number) => {
   const [ordersData, setOrdersData] = useState<any[]>([]);
   const [showOrdersDialog, setShowOrdersDialog] = useState(false);
   const [selectedOrderStatus, setSelectedOrderStatus] = useState<string | null>(null);
+  const [ordersVersion, setOrdersVersion] = useState(0);
+  const live = useLiveUpdates(restaurantId, ['orders'], () => setOrdersVersion((version) => version + 1));
 
   useEffect(() => {
     const loadOrderStats = async () => {
       if (!restaurantId) return;
       try {
-        const response = await fetch(`https://functions.poehali.dev/2ff9cc4a-f745-42e6-bca2-f02bd90f39fd?action=get_orders&restaurantId=${restaurantId}`);
+        const response = await fetch(`${PRODUCTS_API_URL}?action=get_order_stats&restaurantId=${restaurantId}`);
         if (response.ok) {
           const data = await response.json();
-          const orders = data.orders || [];
-          setOrdersData(orders);
-          setOrderStats({
-            pending: orders.filter((o: any) => o.status === 'pending').length,
-            ordered: orders.filter((o: any) => o.status === 'ordered').length,
-            completed: orders.filter((o: any) => o.status === 'completed').length,
-            total: orders.length
-          });
+          setOrderStats(data.stats);
         }
       } catch (error) {
         console.error('Error loading order stats:', error);
       }
     };
     loadOrderStats();
+    if (live) return;
     const interval = setInterval(loadOrderStats, 30000);
     return () => clearInterval(interval);
-  }, [restaurantId]);
+  }, [restaurantId, live, ordersVersion]);
+
+  useEffect(() => {
+    const loadOrders = async () => {
+      if (!restaurantId || !showOrdersDialog) return;
+      try {
+        const response = await fetch(`${PRODUCTS_API_URL}?action=get_orders&restaurantId=${restaurantId}`);
+        if (response.ok) {
+          const data = await response.json();
+          setOrdersData(data.orders || []);
+        }
+      } catch (error) {
+        console.error('Error loading orders:', error);
+      }
+    };
+    loadOrders();
+  }, [restaurantId, showOrdersDialog, ordersVersion]);
 
   return {
     orderStats,
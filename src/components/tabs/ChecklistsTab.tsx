@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -28,6 +28,8 @@ export default function ChecklistsTab({ checklistList, isChefOrSousChef, userNam
   const [newChecklist, setNewChecklist] = useState({ name: '', workshop: '', items: '', responsible: '' });
   const [showChecklistStats, setShowChecklistStats] = useState(false);
   const [editingChecklist, setEditingChecklist] = useState<any>(null);
+  const [editItems, setEditItems] = useState<{ key: number; id?: number; text: string }[]>([]);
+  const nextItemKey = useRef(0);
   const [assigningResponsible, setAssigningResponsible] = useState<number | null>(null);
   const [responsibleName, setResponsibleName] = useState('');
 
@@ -52,21 +54,37 @@ export default function ChecklistsTab({ checklistList, isChefOrSousChef, userNam
     setNewChecklist({
       name: checklist.name,
       workshop: checklist.workshop,
-      items: checklist.items.map((item: any) => item.text).join('\n'),
+      items: '',
       responsible: checklist.responsible || ''
     });
+    setEditItems(checklist.items.map((item: any) => ({ key: nextItemKey.current++, id: item.id, text: item.text })));
   };
 
-  const handleUpdateChecklist = async () => {
-    if (!newChecklist.name || !newChecklist.workshop || !newChecklist.items) return;
-    const items = newChecklist.items.split('\n').filter(i => i.trim()).map((text, idx) => {
-      const existingItem = editingChecklist.items[idx];
-      return {
-        text: text.trim(),
-        status: existingItem?.status || 'pending',
-        timestamp: existingItem?.timestamp
-      };
+  const handleChangeEditItem = (key: number, text: string) => {
+    setEditItems(items => items.map(item => item.key === key ? { ...item, text } : item));
+  };
+
+  const handleMoveEditItem = (index: number, offset: number) => {
+    setEditItems(items => {
+      const target = index + offset;
+      if (target < 0 || target >= items.length) return items;
+      const moved = [...items];
+      [moved[index], moved[target]] = [moved[target], moved[index]];
+      return moved;
     });
+  };
+
+  const handleRemoveEditItem = (key: number) => {
+    setEditItems(items => items.filter(item => item.key !== key));
+  };
+
+  const handleAddEditItem = () => {
+    setEditItems(items => [...items, { key: nextItemKey.current++, text: '' }]);
+  };
+
+  const handleUpdateChecklist = async () => {
+    const items = editItems.filter(item => item.text.trim()).map(item => ({ id: item.id, text: item.text.trim() }));
+    if (!newChecklist.name || !newChecklist.workshop || !items.length) return;
     await onUpdateChecklist({
       id: editingChecklist.id,
       name: newChecklist.name,
@@ -76,6 +94,7 @@ export default function ChecklistsTab({ checklistList, isChefOrSousChef, userNam
     });
     setNewChecklist({ name: '', workshop: '', items: '', responsible: '' });
     setEditingChecklist(null);
+    setEditItems([]);
   };
 
   const handleAssignResponsible = async (checklistId: number) => {
@@ -86,8 +105,7 @@ export default function ChecklistsTab({ checklistList, isChefOrSousChef, userNam
       id: checklistId,
       name: checklist.name,
       workshop: checklist.workshop,
-      responsible: responsibleName,
-      items: checklist.items
+      responsible: responsibleName
     });
     setAssigningResponsible(null);
     setResponsibleName('');
@@ -182,7 +200,7 @@ export default function ChecklistsTab({ checklistList, isChefOrSousChef, userNam
                       </div>
                     </DialogContent>
                   </Dialog>
-                  <Dialog onOpenChange={(open) => { if (!open) { setNewChecklist({ name: '', workshop: '', items: '', responsible: '' }); setEditingChecklist(null); } }}>
+                  <Dialog onOpenChange={(open) => { if (!open) { setNewChecklist({ name: '', workshop: '', items: '', responsible: '' }); setEditingChecklist(null); setEditItems([]); } }}>
                     <DialogTrigger asChild>
                       <Button size="sm" className="gap-2">
                         <Icon name="Plus" size={18} />
@@ -221,16 +239,43 @@ export default function ChecklistsTab({ checklistList, isChefOrSousChef, userNam
                             onChange={(e) => setNewChecklist({...newChecklist, responsible: e.target.value})}
                           />
                         </div>
-                        <div className="space-y-2">
-                          <Label htmlFor="checklist-items">Пункты чек-листа (каждый с новой строки)</Label>
-                          <Textarea 
-                            id="checklist-items" 
-                            placeholder="Проверить температуру холодильников&#10;Проверить чистоту рабочих поверхностей&#10;Проверить наличие инвентаря" 
-                            rows={8}
-                            value={newChecklist.items}
-                            onChange={(e) => setNewChecklist({...newChecklist, items: e.target.value})}
-                          />
-                        </div>
+                        {editingChecklist ? (
+                          <div className="space-y-2">
+                            <Label>Пункты чек-листа</Label>
+                            {editItems.map((item, idx) => (
+                              <div key={item.key} className="flex items-center gap-2">
+                                <Input 
+                                  value={item.text}
+                                  onChange={(e) => handleChangeEditItem(item.key, e.target.value)}
+                                />
+                                <Button size="icon" variant="ghost" disabled={idx === 0} onClick={() => handleMoveEditItem(idx, -1)}>
+                                  <Icon name="ChevronUp" size={16} />
+                                </Button>
+                                <Button size="icon" variant="ghost" disabled={idx === editItems.length - 1} onClick={() => handleMoveEditItem(idx, 1)}>
+                                  <Icon name="ChevronDown" size={16} />
+                                </Button>
+                                <Button size="icon" variant="ghost" onClick={() => handleRemoveEditItem(item.key)}>
+                                  <Icon name="Trash2" size={16} />
+                                </Button>
+                              </div>
+                            ))}
+                            <Button size="sm" variant="outline" className="gap-2" onClick={handleAddEditItem}>
+                              <Icon name="Plus" size={16} />
+                              Добавить пункт
+                            </Button>
+                          </div>
+                        ) : (
+                          <div className="space-y-2">
+                            <Label htmlFor="checklist-items">Пункты чек-листа (каждый с новой строки)</Label>
+                            <Textarea 
+                              id="checklist-items" 
+                              placeholder="Проверить температуру холодильников&#10;Проверить чистоту рабочих поверхностей&#10;Проверить наличие инвентаря" 
+                              rows={8}
+                              value={newChecklist.items}
+                              onChange={(e) => setNewChecklist({...newChecklist, items: e.target.value})}
+                            />
+                          </div>
+                        )}
                         <Button 
                           className="w-full" 
                           onClick={editingChecklist ? handleUpdateChecklist : handleSaveChecklist}
@@ -5,6 +5,7 @@ import { TabsContent } from '@/components/ui/tabs';
 import Icon from '@/components/ui/icon';
 import { Badge } from '@/components/ui/badge';
 import { useAuth } from '@/components/AuthContext';
+import { useLiveUpdates } from '@/hooks/useLiveUpdates';
 import { QRCodeSVG } from 'qrcode.react';
 import {
   Dialog,
@@ -27,14 +28,16 @@ export default function EmployeesTab() {
   const [editingEmployee, setEditingEmployee] = useState<number | null>(null);
   const [newRole, setNewRole] = useState<'chef' | 'sous_chef' | 'cook'>('cook');
   const [localEmployees, setLocalEmployees] = useState(contextEmployees);
+  const live = useLiveUpdates(restaurant?.id, ['employees'], () => loadEmployees());
 
   const inviteLink = restaurant ? `${window.location.origin}?invite=${restaurant.invite_code}` : '';
 
   useEffect(() => {
     loadEmployees();
+    if (live) return;
     const interval = setInterval(loadEmployees, 10000);
     return () => clearInterval(interval);
-  }, []);
+  }, [live]);
 
   const loadEmployees = async () => {
     const emps = await getEmployees();
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -9,6 +9,7 @@ import CreateInventoryDialog from './inventory/CreateInventoryDialog';
 import CookInventoryView from './inventory/CookInventoryView';
 import ChefInventoryView from './inventory/ChefInventoryView';
 import InventoryHistoryView from './inventory/InventoryHistoryView';
+import { useLiveUpdates } from '@/hooks/useLiveUpdates';
 
 const INVENTORY_API_URL = 'https://functions.poehali.dev/085ce3c7-40f0-42a5-afdb-a4083f720fdb';
 
@@ -37,15 +38,25 @@ export default function InventoryTab({
   const [viewInventoryReport, setViewInventoryReport] = useState<any>(null);
   const [tempQuantities, setTempQuantities] = useState<{[key: number]: string}>({});
   const [loading, setLoading] = useState(false);
+  const inventoryRef = useRef(activeInventory);
+  inventoryRef.current = activeInventory;
+  const sync = useRef({ running: false, pending: false, full: false });
+  const live = useLiveUpdates(restaurantId, ['inventory'], (event) => syncActiveInventory(!!event.resync));
 
   useEffect(() => {
     if (restaurantId) {
-      loadActiveInventory();
+      syncActiveInventory(true);
       loadInventoryHistory();
-      const interval = setInterval(loadActiveInventory, 10000);
+      if (live) return;
+      const interval = setInterval(() => syncActiveInventory(), 10000);
       return () => clearInterval(interval);
     }
-  }, [restaurantId]);
+  }, [restaurantId, live]);
+
+  const applyActiveInventory = (inventory: any) => {
+    inventoryRef.current = inventory;
+    setActiveInventory(inventory);
+  };
 
   const loadActiveInventory = async () => {
     if (!restaurantId) return;
@@ -53,13 +64,67 @@ export default function InventoryTab({
       const response = await fetch(`${INVENTORY_API_URL}?action=get_active_inventory&restaurantId=${restaurantId}`);
       if (response.ok) {
         const data = await response.json();
-        setActiveInventory(data.inventory);
+        applyActiveInventory(data.inventory);
       }
     } catch (error) {
       console.error('Error loading active inventory:', error);
     }
   };
 
+  // Дозагрузка изменений после известного change_seq; false — нужна полная загрузка
+  const loadInventoryChanges = async () => {
+    const inventory = inventoryRef.current;
+    if (!inventory || inventory.change_seq == null) return false;
+    try {
+      const response = await fetch(`${INVENTORY_API_URL}?action=get_inventory_changes&inventoryId=${inventory.id}&since=${inventory.change_seq}`);
+      if (!response.ok) return false;
+      const changes = await response.json();
+      if (changes.inventory.status !== 'in_progress' || inventoryRef.current !== inventory) return false;
+      if (changes.version === inventory.change_seq) return true;
+
+      const products = new Map<number, any>(inventory.products.map((product: any) => [product.id, product]));
+      for (const product of changes.products) {
+        products.set(product.id, { entries: [], ...products.get(product.id), name: product.name, type: product.type, product_order: product.product_order });
+      }
+      for (const entry of changes.entries) {
+        const product = products.get(entry.inventory_product_id);
+        if (!product) return false;
+        products.set(product.id, { ...product, entries: [...product.entries, { user_name: entry.user_name, quantity: entry.quantity, created_at: entry.created_at }] });
+      }
+
+      applyActiveInventory({
+        ...inventory,
+        change_seq: changes.version,
+        products: [...products.values()].sort((a, b) => a.product_order - b.product_order || a.name.localeCompare(b.name))
+      });
+      return true;
+    } catch (error) {
+      console.error('Error loading inventory changes:', error);
+      return false;
+    }
+  };
+
+  // Не больше одного запроса одновременно: события во время загрузки схлопываются в один повтор
+  const syncActiveInventory = async (full = false) => {
+    const state = sync.current;
+    state.full = state.full || full;
+    if (state.running) {
+      state.pending = true;
+      return;
+    }
+    state.running = true;
+    try {
+      do {
+        state.pending = false;
+        const fullLoad = state.full;
+        state.full = false;
+        if (fullLoad || !(await loadInventoryChanges())) await loadActiveInventory();
+      } while (state.pending);
+    } finally {
+      state.running = false;
+    }
+  };
+
   const loadInventoryHistory = async () => {
     if (!restaurantId) return;
     try {
@@ -101,7 +166,7 @@ export default function InventoryTab({
       });
       
       if (response.ok) {
-        await loadActiveInventory();
+        await syncActiveInventory(true);
         setInventoryProducts('');
         setInventorySemis('');
         setInventoryDate(new Date().toISOString().split('T')[0]);
@@ -123,7 +188,7 @@ export default function InventoryTab({
       });
       
       if (response.ok) {
-        await loadActiveInventory();
+        await syncActiveInventory(true);
       }
     } catch (error) {
       console.error('Error deleting inventory:', error);
@@ -203,7 +268,7 @@ export default function InventoryTab({
       });
       
       if (response.ok) {
-        await loadActiveInventory();
+        await syncActiveInventory();
         setTempQuantities(prev => {
           const { [productIndex]: _, ...rest } = prev;
           return rest;
@@ -234,7 +299,7 @@ export default function InventoryTab({
       });
       
       if (response.ok) {
-        await loadActiveInventory();
+        await syncActiveInventory(true);
         await loadInventoryHistory();
       }
     } catch (error) {
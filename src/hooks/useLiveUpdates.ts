@@ -0,0 +1,53 @@
+import { useState, useEffect, useRef } from 'react';
+
+const EVENTS_URL = import.meta.env.VITE_EVENTS_URL as string | undefined;
+
+export interface ChangeEvent {
+  restaurantId?: number;
+  versions?: Record<string, number>;
+  change?: Record<string, unknown> | null;
+  resync?: boolean;
+}
+
+export const useLiveUpdates = (
+  restaurantId: number | undefined,
+  resources: string[],
+  onChange: (event: ChangeEvent) => void
+) => {
+  const [connected, setConnected] = useState(false);
+  const onChangeRef = useRef(onChange);
+  onChangeRef.current = onChange;
+  const resourcesKey = resources.join(',');
+
+  useEffect(() => {
+    if (!EVENTS_URL || !restaurantId || typeof EventSource === 'undefined') return;
+
+    const source = new EventSource(`${EVENTS_URL}?restaurantId=${restaurantId}`);
+    let wasConnected = false;
+
+    source.onopen = () => {
+      setConnected(true);
+      if (wasConnected) onChangeRef.current({ resync: true });
+      wasConnected = true;
+    };
+    source.onerror = () => setConnected(false);
+    source.addEventListener('change', (message) => {
+      try {
+        const event: ChangeEvent = JSON.parse((message as MessageEvent).data);
+        const changed = Object.keys(event.versions || {});
+        if (event.resync || changed.some((resource) => resourcesKey.split(',').includes(resource))) {
+          onChangeRef.current(event);
+        }
+      } catch (error) {
+        console.error('Error parsing change event:', error);
+      }
+    });
+
+    return () => {
+      source.close();
+      setConnected(false);
+    };
+  }, [restaurantId, resourcesKey]);
+
+  return connected;
+};
@@ -173,7 +173,8 @@ export const useRestaurantData = (restaurantId: number | undefined) => {
       });
       
       if (response.ok) {
-        setChecklistList(prev => prev.map(c => c.id === checklist.id ? { ...c, ...checklist } : c));
+        const data = await response.json();
+        setChecklistList(prev => prev.map(c => c.id === checklist.id ? { ...c, ...data.checklist } : c));
         return true;
       }
     } catch (error) {